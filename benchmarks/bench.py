@@ -0,0 +1,153 @@
+"""Measures the throughput and latency of pystone's translation paths
+against a local mock server, so no network access is needed.
+
+    python benchmarks/bench.py --requests 200 --latency 0.05 --workers 8
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_server import MockServer  # noqa: E402
+
+import pystone  # noqa: E402
+from pystone.batch import Batch  # noqa: E402
+from pystone.cache import TranslationCache  # noqa: E402
+from pystone.deepl import DeepL  # noqa: E402
+from pystone.executor import Executor  # noqa: E402
+from pystone.session import configure  # noqa: E402
+
+# Rate limits high enough that only the client and server are measured.
+UNLIMITED = {"reverso": 1e6, "deepl": 1e6}
+
+
+def percentile(values, q) -> float:
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def timed(fn, *args):
+    """Calls fn and returns its latency and whether it failed."""
+    start = time.perf_counter()
+    try:
+        fn(*args)
+        failed = False
+    except Exception:
+        failed = True
+    return time.perf_counter() - start, failed
+
+
+def translate(text, cache=None):
+    t = pystone.Translate(text, "English", "Spanish", cache=cache)
+    t.translate()
+    return t
+
+
+def bench_single(texts, args):
+    return [timed(translate, text) for text in texts]
+
+
+def bench_concurrent(texts, args):
+    with Executor(max_workers=args.workers, rates=UNLIMITED) as executor:
+        return list(executor.map(lambda text: timed(translate, text), texts))
+
+
+def bench_batch(texts, args):
+    """Times each record from when the batch reads it to when its result
+    comes out."""
+    read = {}
+
+    def lines():
+        for i, text in enumerate(texts):
+            read[i] = time.perf_counter()
+            yield text + "\n"
+
+    latencies = []
+    with Executor(max_workers=args.workers, rates=UNLIMITED) as executor:
+        batch = Batch("English", "Spanish", executor=executor)
+        for failed, result in batch.run(lines()):
+            latencies.append((time.perf_counter() - read[result["index"]], failed))
+    return latencies
+
+
+def bench_cached(texts, args):
+    cache = TranslationCache()
+    distinct = texts[:max(1, len(texts) // 10)]
+    return [timed(translate, distinct[i % len(distinct)], cache)
+            for i in range(len(texts))]
+
+
+def bench_deepl(texts, args):
+    documents = [" ".join(texts[i:i + 5]) for i in range(0, len(texts), 5)]
+    return [timed(DeepL(document, "English", "German").deepl)
+            for document in documents]
+
+
+def bench_deepl_many(texts, args):
+    documents = [" ".join(texts[i:i + 5]) for i in range(0, len(texts), 5)]
+    t = pystone.Translate(None, "English", "German")
+    latency, failed = timed(t.deepl_many, documents)
+    return [(latency / len(documents), failed)] * len(documents)
+
+
+def bench_audio(texts, args):
+    t = pystone.Translate(None, "English", "Spanish")
+    return [timed(t.audio, text) for text in texts[:max(1, len(texts) // 10)]]
+
+
+BENCHMARKS = {
+    "single": bench_single,
+    "concurrent": bench_concurrent,
+    "batch": bench_batch,
+    "cached": bench_cached,
+    "deepl": bench_deepl,
+    "deepl-many": bench_deepl_many,
+    "audio": bench_audio,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="pystone benchmarks")
+    parser.add_argument("benchmarks", nargs="*", choices=[[], *BENCHMARKS],
+                        help="the benchmarks to run (default: all)")
+    parser.add_argument("-n", "--requests", type=int, default=200,
+                        help="the number of texts per benchmark (default: 200)")
+    parser.add_argument("-w", "--workers", type=int, default=8,
+                        help="the concurrency of concurrent paths (default: 8)")
+    parser.add_argument("--latency", type=float, default=0.02,
+                        help="the mock server's mean latency (default: 0.02)")
+    parser.add_argument("--jitter", type=float, default=0.005)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    args = parser.parse_args()
+
+    server = MockServer(latency=args.latency, jitter=args.jitter,
+                        error_rate=args.error_rate,
+                        throttle_rate=args.throttle_rate,
+                        retry_after=args.retry_after).start()
+    server.patch()
+    configure(pool_maxsize=args.workers, backoff_factor=0.01)
+    texts = [f"This is sentence number {i}." for i in range(args.requests)]
+
+    print(f"{'benchmark':<12}{'n':>6}{'seconds':>10}{'ops/s':>10}"
+          f"{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for name in args.benchmarks or BENCHMARKS:
+        start = time.perf_counter()
+        results = BENCHMARKS[name](texts, args)
+        elapsed = time.perf_counter() - start
+        latencies = [latency for latency, _ in results]
+        errors = sum(failed for _, failed in results)
+        print(f"{name:<12}{len(results):>6}{elapsed:>10.2f}"
+              f"{len(results) / elapsed:>10.1f}"
+              f"{percentile(latencies, 0.5) * 1000:>10.1f}"
+              f"{percentile(latencies, 0.99) * 1000:>10.1f}{errors:>8}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
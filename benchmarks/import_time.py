@@ -0,0 +1,66 @@
+"""Checks that importing pystone stays cheap: the import must finish within
+a time budget and must not load heavy modules that only some callers need.
+Exits with status 1 if either check fails.
+
+    python benchmarks/import_time.py --budget 50 --cli-budget 100
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imports that should only happen once a caller actually needs them.
+HEAVY = ["requests", "urllib3", "playsound", "aiohttp", "sqlite3", "cmd",
+         "argparse", "concurrent.futures"]
+
+# Statements timed in a fresh interpreter each, whether they are held to
+# the library or the CLI budget, and the heavy modules each must not load.
+# The CLI only loads the network stack once a command runs.
+STATEMENTS = {
+    "import": ("import pystone", "budget", HEAVY),
+    "languages": ("import pystone; pystone.resolve('es')", "budget", HEAVY),
+    "cli": ("import pystone.cli", "cli_budget",
+            ["requests", "urllib3", "playsound", "aiohttp", "sqlite3"]),
+}
+
+
+def run(statement, forbidden) -> tuple:
+    """Returns how many milliseconds statement took and the forbidden
+    modules it loaded."""
+    code = (f"import sys, time\nstart = time.perf_counter()\n{statement}\n"
+            f"print((time.perf_counter() - start) * 1000)\n"
+            f"print(','.join(m for m in {forbidden!r} if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True,
+                            text=True, cwd=ROOT, check=True)
+    milliseconds, loaded = result.stdout.splitlines()
+    return float(milliseconds), [m for m in loaded.split(",") if m]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="pystone import-time budget")
+    parser.add_argument("--budget", type=float, default=50.0,
+                        help="the maximum milliseconds to import pystone (default: 50)")
+    parser.add_argument("--cli-budget", type=float, default=100.0,
+                        help="the maximum milliseconds to import the CLI (default: 100)")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="the number of runs; the fastest one counts (default: 5)")
+    args = parser.parse_args()
+
+    failed = False
+    for name, (statement, budget, forbidden) in STATEMENTS.items():
+        runs = [run(statement, forbidden) for _ in range(args.repeat)]
+        milliseconds = min(ms for ms, _ in runs)
+        loaded = runs[0][1]
+        status = "ok"
+        if milliseconds > getattr(args, budget) or loaded:
+            status = "FAIL"
+            failed = True
+        print(f"{name:<12}{milliseconds:>8.1f} ms  {status}"
+              + (f"  (loaded {', '.join(loaded)})" if loaded else ""))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
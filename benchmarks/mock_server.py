@@ -0,0 +1,197 @@
+"""A local stand-in for the Reverso translation, Reverso voice and DeepL
+JSON-RPC endpoints, with configurable latency and error rates.
+
+Run it on its own with:
+
+    python benchmarks/mock_server.py --port 8000 --latency 0.05
+"""
+import argparse
+import gzip
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# A few hundred bytes that start like an MP3 file.
+FAKE_MP3 = b"ID3\x03\x00\x00\x00\x00\x00\x00" + b"\xff\xfb\x90\x64" + bytes(400)
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        return
+
+    def do_POST(self):
+        body = json.loads(self.read_body() or b"{}")
+        if self.fail():
+            return
+        if self.path.startswith("/translate/v1/translation"):
+            return self.send_json(self.reverso(body))
+        if self.path.startswith("/jsonrpc"):
+            return self.send_json(self.deepl(body))
+        self.send_error(404)
+
+    def do_GET(self):
+        if self.fail():
+            return
+        if "GetVoiceStream" in self.path:
+            return self.send_body(FAKE_MP3, "audio/mpeg")
+        self.send_error(404)
+
+    def fail(self) -> bool:
+        """Sleeps for the configured latency, then answers with an error
+        instead of a result for the configured share of requests."""
+        server = self.server
+        time.sleep(max(0.0, random.gauss(server.latency, server.jitter)))
+        roll = random.random()
+        if roll < server.throttle_rate:
+            self.send_response(429)
+            self.send_header("retry-after", str(server.retry_after))
+            self.send_header("content-length", "0")
+            self.end_headers()
+            return True
+        if roll < server.throttle_rate + server.error_rate:
+            self.send_error(500)
+            return True
+        return False
+
+    def read_body(self) -> bytes:
+        """Reads the request body, chunked or not, and gunzips it."""
+        if self.headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b";")[0], 16)
+                chunk = self.rfile.read(size + 2)[:size]
+                if not size:
+                    break
+                chunks.append(chunk)
+            body = b"".join(chunks)
+        else:
+            body = self.rfile.read(int(self.headers.get("content-length", 0)))
+        if self.headers.get("content-encoding") == "gzip":
+            body = gzip.decompress(body)
+        return body
+
+    def send_json(self, data) -> None:
+        """Sends data compressed like a real server would: with brotli or
+        gzip, whichever the client accepts first."""
+        body = json.dumps(data).encode()
+        accepted = [e.strip() for e in self.headers.get("accept-encoding", "").split(",")]
+        if "br" in accepted and brotli is not None:
+            self.send_body(brotli.compress(body, quality=5), "application/json", "br")
+        elif "gzip" in accepted:
+            self.send_body(gzip.compress(body), "application/json", "gzip")
+        else:
+            self.send_body(body, "application/json")
+
+    def send_body(self, body, content_type, encoding=None) -> None:
+        self.send_response(200)
+        self.send_header("content-type", content_type)
+        if encoding:
+            self.send_header("content-encoding", encoding)
+        self.send_header("content-length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    @staticmethod
+    def reverso(body) -> dict:
+        text = body.get("input", "")
+        translation = text.upper()
+        return {
+            "input": [text],
+            "translation": [translation],
+            "contextResults": {
+                "results": [
+                    {
+                        "translation": translation,
+                        "sourceExamples": [f"<em>{text}</em> example"],
+                        "targetExamples": [f"<em>{translation}</em> EXAMPLE"]
+                    },
+                    {
+                        "translation": translation.title(),
+                        "sourceExamples": [],
+                        "targetExamples": []
+                    }
+                ]
+            }
+        }
+
+    @staticmethod
+    def deepl(body) -> dict:
+        params = body.get("params", {})
+        if body.get("method") == "LMT_split_into_sentences":
+            splitted = [[s for s in re.split(r"(?<=[.!?])\s+", text) if s]
+                        for text in params.get("texts", [])]
+            return {"jsonrpc": "2.0", "result": {"splitted_texts": splitted}}
+        translations = [
+            {"beams": [{"postprocessed_sentence": job["raw_en_sentence"].upper()}
+                       for _ in range(job.get("preferred_num_beams", 1))]}
+            for job in params.get("jobs", [])]
+        return {"jsonrpc": "2.0", "result": {"translations": translations}}
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0,
+                 error_rate=0.0, throttle_rate=0.0, retry_after=1):
+        super().__init__((host, port), MockHandler)
+        self.retry_after = retry_after
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockServer":
+        """Serves requests from a background thread."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def patch(self) -> None:
+        """Points the pystone providers at this server."""
+        from pystone.deepl import DeepL
+        from pystone.reverso import Reverso
+        Reverso.api = f"{self.url}/translate/v1/translation"
+        Reverso.voice_url = (f"{self.url}/RestPronunciation.svc/v1/output=json/"
+                             "GetVoiceStream/voiceName={}?inputText={}")
+        DeepL.api = f"{self.url}/jsonrpc"
+        return
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mock Reverso and DeepL server")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="mean seconds before answering (default: 0.05)")
+    parser.add_argument("--jitter", type=float, default=0.01,
+                        help="standard deviation of the latency (default: 0.01)")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="share of requests answered with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0,
+                        help="share of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1,
+                        help="whole seconds sent in Retry-After with 429 (default: 1)")
+    args = parser.parse_args()
+    server = MockServer(port=args.port, latency=args.latency, jitter=args.jitter,
+                        error_rate=args.error_rate, throttle_rate=args.throttle_rate,
+                        retry_after=args.retry_after)
+    print(f"Serving on {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+from .cli import main
+
+# Lets pystone run as "python -m pystone":
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import asyncio
+import contextlib
+import time
+import weakref
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from .deepl import DeepL
+from .metrics import metrics
+from .providers import gzip_body
+from .result import TranslationResult
+from .reverso import Reverso
+
+_sessions = weakref.WeakKeyDictionary()
+
+
+def get_async_session(limit=100, limit_per_host=0) -> "aiohttp.ClientSession":
+    """Returns the ClientSession shared by every async call made on the
+    running event loop, creating it on first use."""
+    if aiohttp is None:
+        raise ImportError(
+            "the async clients require aiohttp: pip install pystone[async]")
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=limit, limit_per_host=limit_per_host, ttl_dns_cache=300)
+        session = aiohttp.ClientSession(connector=connector)
+        _sessions[loop] = session
+    return session
+
+
+async def close_async_session() -> None:
+    """Closes the ClientSession of the running event loop, if any."""
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session.close()
+    return
+
+
+class AsyncProvider:
+    """The network half of a Provider, made on the running event loop.
+    Mixed into a Provider subclass, whose payload and parsing helpers it
+    reuses."""
+
+    def create_session(self) -> "aiohttp.ClientSession":
+        """Returns the event loop's shared ClientSession object."""
+        return get_async_session()
+
+    @contextlib.asynccontextmanager
+    async def request(self, method, url, **kwargs):
+        """Sends a request through the ClientSession and yields the
+        response, recording the round trip ("send") time, the response
+        status and any error like Provider.request. The request is given
+        up after timeout seconds if one is set, and the body is gzipped if
+        compress is set."""
+        labels = self.labels()
+        if self.timeout is not None:
+            kwargs["timeout"] = aiohttp.ClientTimeout(total=self.timeout)
+        if self.compress and kwargs.get("data") is not None:
+            kwargs["data"] = gzip_body(kwargs["data"])
+            kwargs["headers"] = {**kwargs.get("headers", {}),
+                                 "content-encoding": "gzip"}
+        start = time.perf_counter()
+        try:
+            async with self.s.request(method, url, **kwargs) as r:
+                metrics.increment("pystone_requests_total",
+                                  status=str(r.status), **labels)
+                yield r
+        except Exception as e:
+            metrics.increment("pystone_errors_total",
+                              type=type(e).__name__, **labels)
+            raise
+        finally:
+            metrics.observe("pystone_phase_seconds", time.perf_counter() - start,
+                            phase="send", **labels)
+
+    async def post_json(self, payload) -> dict:
+        """Posts payload to the API endpoint and decodes the response."""
+        async with self.request("POST", self.api, data=payload,
+                                headers=self.headers) as r:
+            r.raise_for_status()
+            return await r.json(content_type=None)
+
+
+class AsyncReverso(AsyncProvider, Reverso):
+    """Reverso with its network calls made on the running event loop."""
+
+    async def reverso(self) -> TranslationResult:
+        self.s = self.s or self.create_session()
+        self.set_languages()
+        response = await self.get_reverso_translation_response()
+        parsed_response = self.parse_reverso_translation_response(response)
+        return parsed_response
+
+    async def translate(self) -> TranslationResult:
+        return await self.reverso()
+
+    async def get_reverso_translation_response(self) -> dict:
+        """Sends source text to the Reverso API endpoint."""
+        return await self.post_json(self.get_reverso_translation_payload())
+
+    async def audio(self) -> bytes:
+        self.s = self.s or self.create_session()
+        voice_name = self.get_reverso_voice()
+        input_text = self.base64_translation()
+        content = await self.get_reverso_translation_audio(voice_name, input_text)
+        return content
+
+    async def get_reverso_translation_audio(self, voice, text) -> bytes:
+        async with self.request("GET", self.voice_url.format(voice, text),
+                                headers=self.get_audio_headers()) as r:
+            r.raise_for_status()
+            return await r.read()
+
+    async def stream_audio(self, chunk_size=8192):
+        """Like audio but yields the MP3 in chunks as they arrive."""
+        self.s = self.s or self.create_session()
+        voice_name = self.get_reverso_voice()
+        input_text = self.base64_translation()
+        async for chunk in self.stream_reverso_translation_audio(
+                voice_name, input_text, chunk_size):
+            yield chunk
+
+    async def stream_reverso_translation_audio(self, voice, text, chunk_size=8192):
+        async with self.request("GET", self.voice_url.format(voice, text),
+                                headers=self.get_audio_headers()) as r:
+            r.raise_for_status()
+            async for chunk in r.content.iter_chunked(chunk_size):
+                yield chunk
+
+
+class AsyncDeepL(AsyncProvider, DeepL):
+    """DeepL with its network calls made on the running event loop. The
+    packed LMT_handle_jobs requests of deepl_many are sent concurrently.
+    Request bodies are never chunked."""
+
+    async def deepl(self) -> dict:
+        return (await self.deepl_many([self.text]))[0]
+
+    async def translate(self) -> dict:
+        return {**await self.deepl(), "alternatives": None}
+
+    async def deepl_many(self, texts) -> list:
+        self.s = self.s or self.create_session()
+        self.set_languages()
+        documents = self.get_documents(await self.split_sentences(texts))
+        translations = [[] for _ in documents]
+        batches = self.pack_jobs(documents)
+        responses = await asyncio.gather(*(self.get_deepl_translation_response(
+            [job for _, job in packed]) for packed in batches))
+        for packed, response in zip(batches, responses):
+            self.add_translations(translations, packed, response)
+        return self.parse_translations(translations)
+
+    async def split_sentences(self, texts=None) -> dict:
+        return await self.post_json(self.get_split_sentences_payload(texts))
+
+    async def get_deepl_translation_response(self, jobs) -> dict:
+        return await self.post_json(self.get_deepl_translation_payload(jobs))
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+
+# Bitrates in kbit/s of MPEG-1 and of MPEG-2 and 2.5 Layer III frames,
+# by the bitrate index of the frame header.
+BITRATES = {
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+
+# Sample rates by MPEG version bits, then by the sample rate index.
+SAMPLE_RATES = {
+    0b11: [44100, 48000, 32000],
+    0b10: [22050, 24000, 16000],
+    0b00: [11025, 12000, 8000],
+}
+
+
+def default_audio_directory() -> str:
+    """The default location of the audio cache."""
+    root = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache")
+    return os.path.join(root, "pystone", "audio")
+
+
+class AudioCache:
+    """Stores rendered MP3 files on disk, addressed by a hash of the voice
+    and the text so that a phrase is only ever downloaded once."""
+
+    def __init__(self, directory=None):
+        self.directory = directory or default_audio_directory()
+
+    def path(self, voice, text) -> str:
+        """Gets the path where the audio for voice and text is stored."""
+        digest = hashlib.sha256(f"{voice}\0{text}".encode()).hexdigest()
+        return os.path.join(self.directory, digest[:2], f"{digest}.mp3")
+
+    def get(self, voice, text):
+        """Gets the path of the cached audio or None."""
+        path = self.path(voice, text)
+        return path if os.path.exists(path) else None
+
+    def write(self, voice, text, chunks, sink=None) -> str:
+        """Writes chunks to the cache as they arrive, copying each one to
+        sink if given. The file is written under a temporary name and
+        moved into place at the end, so concurrent writers never see or
+        leave behind partial files."""
+        path = self.path(voice, text)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    if sink is not None:
+                        sink.write(chunk)
+                        sink.flush()
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return path
+
+
+def frame_length(data) -> int:
+    """Gets the length of the MPEG Layer III frame at the start of data,
+    or 0 if data doesn't start with one."""
+    if len(data) < 4 or data[0] != 0xFF or data[1] & 0xE0 != 0xE0:
+        return 0
+    version = (data[1] >> 3) & 0b11
+    layer = (data[1] >> 1) & 0b11
+    bitrate_index = data[2] >> 4
+    rate_index = (data[2] >> 2) & 0b11
+    if version == 0b01 or layer != 0b01 or bitrate_index in (0, 15) or rate_index == 3:
+        return 0
+    bitrate = BITRATES[1 if version == 0b11 else 2][bitrate_index] * 1000
+    sample_rate = SAMPLE_RATES[version][rate_index]
+    padding = (data[2] >> 1) & 1
+    return (144 if version == 0b11 else 72) * bitrate // sample_rate + padding
+
+
+def mp3_frames(data) -> bytes:
+    """Strips the ID3 tags, and the Xing or Info frame that describes the
+    file's length, from an MP3 so that its frames can be appended to
+    another MP3's without re-encoding."""
+    while data[:3] == b"ID3" and len(data) >= 10:
+        size = 0
+        for byte in data[6:10]:
+            size = size << 7 | byte & 0x7F
+        footer = 10 if data[5] & 0x10 else 0
+        data = data[10 + size + footer:]
+    if len(data) >= 128 and data[-128:-125] == b"TAG":
+        data = data[:-128]
+    length = frame_length(data)
+    if length and data[4 + side_info_length(data):][:4] in (b"Xing", b"Info"):
+        data = data[length:]
+    return data
+
+
+def side_info_length(data) -> int:
+    """Gets the length of the side information following the header of
+    the Layer III frame at the start of data, after which a Xing or Info
+    tag would be."""
+    mpeg1 = (data[1] >> 3) & 0b11 == 0b11
+    mono = data[3] >> 6 == 0b11
+    if mpeg1:
+        return 17 if mono else 32
+    return 9 if mono else 17
+
+
+def concatenate_mp3(parts):
+    """Yields the frames of every MP3 in parts, which together play as a
+    single MP3."""
+    for part in parts:
+        yield mp3_frames(part)
+
+
+def export_audio(translate, phrases, directory, executor, voice=None) -> list:
+    """Renders the audio for every phrase in parallel through executor,
+    under the Reverso rate limit, and copies the files into directory as
+    00001.mp3, 00002.mp3, ... alongside an index.jsonl manifest. Phrases
+    are read by voice, or by the target language's voice. Returns an
+    (index, phrase, path or exception) list."""
+    os.makedirs(directory, exist_ok=True)
+
+    def render(item):
+        index, phrase = item
+        try:
+            path = executor.call("reverso", translate.audio_file, phrase,
+                                 voice=voice)
+        except Exception as e:
+            return index, phrase, e
+        target = os.path.join(directory, f"{index:05d}.mp3")
+        shutil.copyfile(path, target)
+        return index, phrase, target
+
+    items = enumerate(phrases, 1)
+    results = list(executor.map(render, items))
+    with open(os.path.join(directory, "index.jsonl"), "w", encoding="utf-8") as f:
+        for index, phrase, path in results:
+            record = {"index": index, "text": phrase}
+            if isinstance(path, Exception):
+                record["error"] = f"{type(path).__name__}: {path}"
+            else:
+                record["file"] = os.path.basename(path)
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return results
@@ -0,0 +1,314 @@
+import csv
+import json
+import os
+import re
+import sys
+
+from .executor import Executor
+
+FORMATS = ["text", "jsonl", "csv", "po"]
+EXTENSIONS = {".txt": "text", ".jsonl": "jsonl", ".csv": "csv", ".po": "po"}
+
+
+def guess_format(path) -> str:
+    """Guesses the input format from a file extension."""
+    if not path:
+        return "text"
+    return EXTENSIONS.get(os.path.splitext(path)[1].lower(), "text")
+
+
+class InvalidRecord(dict):
+    """A record that couldn't be read, holding the "error" and the
+    offending "line"."""
+
+
+def read_text(f, field="text"):
+    """Yields a record for every non-empty line."""
+    for line in f:
+        line = line.rstrip("\r\n")
+        if line.strip():
+            yield {field: line}
+
+
+def read_jsonl(f, field="text"):
+    """Yields a record for every JSON object. Malformed lines are yielded
+    as InvalidRecords instead of aborting the run."""
+    for line in f:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield InvalidRecord(error=f"invalid JSON: {e}", line=line.rstrip("\r\n"))
+            continue
+        if not isinstance(record, dict):
+            record = {field: record}
+        yield record
+
+
+def read_csv(f, field="text"):
+    """Yields a record for every CSV row."""
+    yield from csv.DictReader(f)
+
+
+PO_STRING = re.compile(r'^"(.*)"\s*$')
+PO_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", '"': '"', "\\": "\\"}
+
+
+def po_unescape(text) -> str:
+    """Unescapes the body of a gettext string literal."""
+    return re.sub(r"\\(.)", lambda m: PO_ESCAPES.get(m.group(1), m.group(1)), text)
+
+
+def read_po(f, field="text"):
+    """Yields a record for every message of a gettext catalog. The header
+    entry, which has an empty msgid, is skipped."""
+    entry, key = {}, None
+    for line in f:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            if "msgid" in entry:
+                yield from _po_record(entry, field)
+                entry, key = {}, None
+            continue
+        match = PO_STRING.match(line)
+        if match and key:
+            entry[key] += po_unescape(match.group(1))
+            continue
+        keyword, _, value = line.partition(" ")
+        if keyword == "msgctxt" and "msgid" in entry:
+            yield from _po_record(entry, field)
+            entry = {}
+        match = PO_STRING.match(value)
+        key = keyword
+        entry[key] = po_unescape(match.group(1)) if match else ""
+    if "msgid" in entry:
+        yield from _po_record(entry, field)
+
+
+def _po_record(entry, field):
+    if not entry["msgid"]:
+        return
+    record = {field: entry["msgid"]}
+    if "msgctxt" in entry:
+        record["msgctxt"] = entry["msgctxt"]
+    yield record
+
+
+READERS = {
+    "text": read_text,
+    "jsonl": read_jsonl,
+    "csv": read_csv,
+    "po": read_po,
+}
+
+
+class Checkpoint:
+    """Remembers the index of the last record written, and the sizes of
+    the output files at that point, so that a batch can be resumed after
+    an interruption without writing any record twice."""
+
+    def __init__(self, path, every=100):
+        self.path = path
+        self.every = every
+        self.index = -1
+        # The sizes of the output and error files, None for other streams.
+        self.offsets = None
+        self._pending = 0
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            self.index = state["index"]
+            self.offsets = state.get("offsets")
+
+    @property
+    def resumed(self) -> bool:
+        return self.index >= 0
+
+    def update(self, index) -> None:
+        """Records index as done and saves every self.every updates."""
+        self.index = index
+        self._pending += 1
+        if self._pending >= self.every:
+            self.save()
+        return
+
+    def save(self) -> None:
+        """Atomically writes the checkpoint to disk."""
+        if not self.path or not self._pending:
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state(), f)
+        os.replace(tmp, self.path)
+        self._pending = 0
+        return
+
+    def state(self) -> dict:
+        """What is saved to the checkpoint file."""
+        if self.offsets is None:
+            return {"index": self.index}
+        return {"index": self.index, "offsets": self.offsets}
+
+
+class Batch:
+    """Translates a stream of records concurrently, yielding a result or
+    an error for each record in input order as soon as it is ready."""
+
+    def __init__(self, source, target, fmt="text", field="text",
+                 provider="reverso", checkpoint=None, checkpoint_every=100,
+                 s=None, executor=None, cache=None, group_size=None,
+                 memory=None):
+        self.source = source
+        self.target = target
+        self.fmt = fmt
+        self.field = field
+        self.provider = provider
+        self.checkpoint = Checkpoint(checkpoint, checkpoint_every)
+        self.s = s
+        self.executor = executor or Executor()
+        self.cache = cache
+        self.memory = memory
+        self.group_size = group_size or (20 if provider == "deepl" else 1)
+
+    def read(self, f):
+        """Yields (index, record) pairs, skipping any records that were
+        completed before the last checkpoint."""
+        records = READERS[self.fmt](f, self.field)
+        for index, record in enumerate(records):
+            if index > self.checkpoint.index:
+                yield index, record
+
+    def translate(self, texts) -> list:
+        """Translates a group of texts with the configured provider. DeepL
+        translates the whole group at once, split by detected language if
+        the source is "auto", Reverso one text at a time."""
+        from .translate import Translate
+        translate = Translate(None, self.source, self.target, s=self.s,
+                              cache=self.cache, memory=self.memory)
+        if self.provider == "deepl":
+            results = []
+            for r in translate.deepl_many(texts):
+                result = {"translation": r["translation"], "alternatives": None,
+                          "examples": r["examples"]}
+                if "source" in r:
+                    result["source"] = r["source"]
+                results.append(result)
+            return results
+        results = []
+        for text in texts:
+            translate.text = text
+            translate.translate()
+            results.append(translate.to_dict())
+        return results
+
+    def group(self, items):
+        """Yields lists of up to group_size (index, record) pairs."""
+        group = []
+        for item in items:
+            group.append(item)
+            if len(group) >= self.group_size:
+                yield group
+                group = []
+        if group:
+            yield group
+
+    def process(self, group) -> list:
+        """Translates a group of records, capturing any failure in the
+        result of the record that caused it. Returns an (index, failed,
+        result) triple per record, where the result is the record with its
+        "index" in the input and the translation or "error". If a group
+        fails as a whole, its records are retried one by one."""
+        outcomes, pending = [], []
+        for index, record in group:
+            result = {"index": index, **record}
+            # The position wins over an "index" field of the record.
+            result["index"] = index
+            if isinstance(record, InvalidRecord):
+                outcomes.append((index, True, result))
+            elif not record.get(self.field):
+                result["error"] = f"missing field: {self.field}"
+                outcomes.append((index, True, result))
+            else:
+                outcomes.append((index, False, result))
+                pending.append(len(outcomes) - 1)
+        if not pending:
+            return outcomes
+        try:
+            translations = self.executor.call(
+                self.provider, self.translate,
+                [outcomes[i][2][self.field] for i in pending])
+        except Exception as e:
+            for i in pending:
+                index, _, result = outcomes[i]
+                if len(pending) == 1:
+                    result["error"] = f"{type(e).__name__}: {e}"
+                    outcomes[i] = (index, True, result)
+                else:
+                    outcomes[i] = self.process([(index, result)])[0]
+            return outcomes
+        for i, translation in zip(pending, translations):
+            outcomes[i][2].update(translation)
+        return outcomes
+
+    def run(self, f):
+        """Yields a (failed, result) pair for every record read from f."""
+        try:
+            groups = self.executor.map(self.process, self.group(self.read(f)))
+            for outcomes in groups:
+                for index, failed, result in outcomes:
+                    yield failed, result
+                    self.checkpoint.update(index)
+        finally:
+            self.checkpoint.save()
+
+
+def main(args, cache=None, memory=None) -> None:
+    """Runs the batch subcommand."""
+    fmt = args.format or guess_format(args.input)
+    rates = {args.provider: args.rate} if args.rate else None
+    executor = Executor(max_workers=args.workers, rates=rates)
+    batch = Batch(args.source, args.target, fmt=fmt, field=args.field,
+                  provider=args.provider, checkpoint=args.checkpoint,
+                  executor=executor, cache=cache, memory=memory)
+    fin, fout, ferr = open_streams(args, batch.checkpoint)
+    try:
+        for failed, result in batch.run(fin):
+            stream = ferr if failed else fout
+            stream.write(json.dumps(result, ensure_ascii=False) + "\n")
+            stream.flush()
+            batch.checkpoint.offsets = file_offsets((fout, ferr))
+    finally:
+        executor.shutdown()
+        close_streams((fin, fout, ferr))
+    return
+
+
+def open_streams(args, checkpoint) -> tuple:
+    """Opens the input, output and error streams of a batch. The output
+    and errors of a resumed one are appended to, after cutting them back
+    to their size when the checkpoint was saved."""
+    mode = "a" if checkpoint.resumed else "w"
+    fin = open(args.input, "r", encoding="utf-8", newline="") if args.input else sys.stdin
+    fout = open(args.output, mode, encoding="utf-8") if args.output else sys.stdout
+    ferr = open(args.errors, mode, encoding="utf-8") if args.errors else sys.stderr
+    if checkpoint.resumed and checkpoint.offsets:
+        for stream, offset in zip((fout, ferr), checkpoint.offsets):
+            if offset is not None and stream not in (sys.stdout, sys.stderr):
+                stream.truncate(min(offset, stream.tell()))
+    return fin, fout, ferr
+
+
+def file_offsets(streams) -> list:
+    """The size of each stream that is a file, or None for stdout and
+    stderr."""
+    return [None if stream in (sys.stdout, sys.stderr) else stream.tell()
+            for stream in streams]
+
+
+def close_streams(streams) -> None:
+    """Closes the streams that aren't stdin, stdout or stderr."""
+    for stream in streams:
+        if stream not in (sys.stdin, sys.stdout, sys.stderr):
+            stream.close()
+    return
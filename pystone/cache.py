@@ -0,0 +1,190 @@
+import collections
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+def default_cache_path() -> str:
+    """The default location of the persistent translation cache."""
+    root = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache")
+    return os.path.join(root, "pystone", "translations.sqlite3")
+
+
+class LRUCache:
+    """A thread-safe in-memory cache that evicts the least recently used
+    entry once it holds maxsize entries, and expires entries older than
+    ttl seconds."""
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        """Gets the value stored under key or None."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, created = item
+            if self.ttl is not None and time.time() - created > self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, created=None) -> None:
+        with self._lock:
+            self._data[key] = (value, created or time.time())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+        return
+
+
+class SQLiteCache:
+    """A persistent cache of JSON values stored in a SQLite database.
+    Entries older than ttl seconds are expired, and once more than
+    max_entries are stored the least recently used tenth is evicted."""
+
+    def __init__(self, path=None, ttl=30 * 24 * 60 * 60, max_entries=100000):
+        self.path = path or default_cache_path()
+        self.ttl = ttl
+        self.max_entries = max_entries
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)),
+                        exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )""")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def get(self, key):
+        """Gets the value stored under key or None."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            value, created = row
+            with self._conn:
+                if self.ttl is not None and now - created > self.ttl:
+                    self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                    return None
+                self._conn.execute(
+                    "UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+        return json.loads(value)
+
+    def set(self, key, value) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)",
+                # Mappings such as TranslationResult are stored as dicts.
+                (key, json.dumps(value, ensure_ascii=False, default=dict), now, now))
+            count = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute("""
+                    DELETE FROM cache WHERE key IN (
+                        SELECT key FROM cache ORDER BY accessed LIMIT ?
+                    )""", (count - self.max_entries + self.max_entries // 10,))
+        return
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM cache")
+        return
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+        return
+
+
+class TranslationCache:
+    """Caches parsed provider responses keyed by (provider, source,
+    target, text) in an in-memory LRU in front of an optional persistent
+    store, counting hits and misses along the way."""
+
+    def __init__(self, store=None, maxsize=1024, ttl=None):
+        self.memory = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.store = store
+        self.memory_hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(provider, source, target, text) -> str:
+        """Hashes the lookup fields into a compact cache key."""
+        raw = json.dumps([provider, source, target, text], ensure_ascii=False)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, provider, source, target, text):
+        """Gets a cached parsed response or None."""
+        key = self.key(provider, source, target, text)
+        value = self.memory.get(key)
+        if value is not None:
+            self._count("memory_hits")
+            return value
+        if self.store is not None:
+            value = self.store.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+                self._count("store_hits")
+                return value
+        self._count("misses")
+        return None
+
+    def set(self, provider, source, target, text, value) -> None:
+        key = self.key(provider, source, target, text)
+        self.memory.set(key, value)
+        if self.store is not None:
+            self.store.set(key, value)
+        return
+
+    def _count(self, name) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+        return
+
+    @property
+    def hits(self) -> int:
+        return self.memory_hits + self.store_hits
+
+    def stats(self) -> dict:
+        """Gets the hit and miss counters."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "memory_hits": self.memory_hits,
+            "store_hits": self.store_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
@@ -0,0 +1,66 @@
+import re
+
+# Boundaries to split at, from the most to the least preferred. Each
+# pattern captures its separator so that no text is lost when splitting.
+BOUNDARIES = [
+    re.compile(r"(\n\s*\n)"),
+    re.compile(r"((?<=[.!?…])\s+|(?<=[。！？]))"),
+    re.compile(r"(\s+)"),
+]
+
+
+def split_units(text, pattern) -> list:
+    """Splits text at pattern, keeping each separator attached to the end
+    of the unit before it."""
+    parts = pattern.split(text)
+    units = ["".join(parts[i:i + 2]) for i in range(0, len(parts), 2)]
+    return [unit for unit in units if unit]
+
+
+def split_pieces(text, limit, level=0) -> list:
+    """Splits text into pieces no longer than limit characters, only
+    falling back to a finer boundary for pieces that are still too long.
+    Words longer than limit are cut."""
+    if len(text) <= limit:
+        return [text]
+    if level == len(BOUNDARIES):
+        return [text[i:i + limit] for i in range(0, len(text), limit)]
+    pieces = []
+    for unit in split_units(text, BOUNDARIES[level]):
+        pieces.extend(split_pieces(unit, limit, level + 1))
+    return pieces
+
+
+def chunk_text(text, limit) -> list:
+    """Splits text into chunks of at most limit characters at paragraph
+    and sentence boundaries where possible. Joining the chunks gives back
+    the original text."""
+    chunks = []
+    current = ""
+    for piece in split_pieces(text, limit):
+        if current and len(current) + len(piece) > limit:
+            chunks.append(current)
+            current = piece
+        else:
+            current += piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_sentences(text) -> list:
+    """Splits text into its paragraphs' sentences, each keeping the
+    whitespace after it. Joining the sentences gives back the original
+    text."""
+    return [sentence for paragraph in split_units(text, BOUNDARIES[0])
+            for sentence in split_units(paragraph, BOUNDARIES[1])]
+
+
+def strip_chunk(chunk) -> tuple:
+    """Splits a chunk into its leading whitespace, body and trailing
+    whitespace so a translation of the body can be put back in place."""
+    body = chunk.strip()
+    if not body:
+        return chunk, "", ""
+    start = chunk.index(body)
+    return chunk[:start], body, chunk[start + len(body):]
@@ -0,0 +1,485 @@
+import argparse
+import cmd
+import json
+import logging
+import os
+import platform
+import sys
+
+from . import batch
+from .constants import SERVER_ADDRESS
+from .detection import AUTO, is_auto
+from .languages import LanguageError, resolve
+from .metrics import metrics
+
+
+class PyStone(cmd.Cmd):
+    intro = "This is \033[38;5;14mpystone\033[0m, a command line interpreter for translation. Type \033[38;5;209mhelp\033[0m or \033[38;5;209m?\033[0m to view available commands."
+    prompt = "(pystone) "
+
+    DEBUG_FMT = "%(levelname)s - %(message)s"
+    INFO_FMT = "%(message)s"
+
+    def __init__(self, args, translation=None, alternatives=None,
+                 examples=None, level=logging.INFO, cache=None, router=None,
+                 memory=None):
+        super().__init__()
+        from .translate import Translate
+        self.translate = Translate(
+            args.text, args.source, args.target, cache=cache, router=router,
+            memory=memory)
+        # The most recent result; translation, examples and alternatives
+        # are read from it rather than copied out of it.
+        self.result = {"translation": translation, "examples": examples,
+                       "alternatives": alternatives}
+        # Logger setup:
+        self.log = logging.getLogger(__package__)
+        self.log.setLevel(level)
+        if not self.log.handlers:
+            formatter = logging.Formatter(fmt=(
+                self.INFO_FMT if level == logging.INFO else self.DEBUG_FMT))
+            sh = logging.StreamHandler()
+            sh.setLevel(level)
+            sh.setFormatter(fmt=formatter)
+            self.log.addHandler(sh)
+        metrics.add_hook(self._log_metric)
+
+    @property
+    def translation(self) -> str:
+        return self.result["translation"] if self.result else None
+
+    @property
+    def examples(self) -> list:
+        return self.result["examples"] if self.result else None
+
+    @property
+    def alternatives(self) -> list:
+        return self.result["alternatives"] if self.result else None
+
+    def do_settings(self, arg) -> None:
+        """Outputs the current session configuration to the console."""
+        self.log.info(f"""
+        Source language: {self.translate.source}
+        Target language: {self.translate.target}
+        Current text: {self.translate.text}
+        Most recent translation: {self.translation}
+        Cache: {self._cache_summary()}
+        """)
+        return
+
+    def do_set(self, arg) -> None:
+        """Expects 1 or 2 languages separated by spaces as input.
+        If one argument is provided, the target language will be
+        changed to the specified language. If two arguments are provided,
+        both the source language and the target language will
+        be changed (in that order). A source language of "auto" is
+        detected from each text."""
+        if not arg:
+            return
+        args = arg.split()
+        num_args = len(args)
+        if num_args > 2:
+            print("*** Maximum no. args: 2")
+            return
+        try:
+            languages = [AUTO if is_auto(a) and i == 0 and num_args == 2
+                         else resolve(a).capitalize() for i, a in enumerate(args)]
+        except LanguageError as e:
+            self.log.warning(f"*** {e}")
+            return
+        if num_args == 1:
+            self.translate.target = languages[0]
+        else:
+            self.translate.source, self.translate.target = languages
+
+    def do_translate(self, arg) -> None:
+        """Takes text from the source language to translate and prints
+        the translation to the console from Reverso.
+        "translate --to LANGUAGE,LANGUAGE,... [TEXT]" translates the text
+        into all of the given languages at once."""
+        if arg.startswith("--to"):
+            return self._translate_many(arg)
+        if not self._check_configuration():
+            return
+        if not arg and self.translation:
+            return self._print_translation()
+        self.translate.text = arg if arg else self.translate.text
+        self.translate.translate()
+        self.result = self.translate.result
+        return self._print_translation()
+
+    def _translate_many(self, arg) -> None:
+        """Prints translations into several languages as each completes."""
+        _, _, rest = arg.partition(" ")
+        languages, _, text = rest.strip().partition(" ")
+        if not languages:
+            print("*** Usage: translate --to LANGUAGE,LANGUAGE,... [TEXT]")
+            return
+        try:
+            targets = [resolve(language).capitalize()
+                       for language in languages.split(",") if language]
+        except LanguageError as e:
+            self.log.warning(f"*** {e}")
+            return
+        self.translate.text = text.strip() or self.translate.text
+        if not self.translate.text:
+            return
+        self.log.info(f"\n        {self.translate.text}\n")
+        for target, result in self.translate.iter_translate_many(targets):
+            if isinstance(result, Exception):
+                self.log.warning(f"        {target}: {result}")
+            else:
+                self.log.info(
+                    f"        {target}: \033[38;5;141m{result['translation']}\033[0m")
+        return
+
+    def do_examples(self, arg) -> None:
+        """Prints examples alongside any translations, if available."""
+        if self.examples:
+            for e in self.examples:
+                new_e = e.replace("<em>", "\033[38;5;39m").replace(
+                    "</em>", "\033[0m")
+                self.log.info(new_e)
+        else:
+            return
+
+    def do_alternatives(self, arg) -> None:
+        """Prints alternative translations, if available."""
+        if self.alternatives:
+            for a in self.alternatives:
+                self.log.info(f"\033[38;5;141m{a}\033[0m")
+        else:
+            return
+
+    def do_audio(self, arg) -> None:
+        """Inputs a translation into a Reverso text-to-speech voice
+        reader. Audio is cached so replaying it is instant. Long
+        translations are read in full, a few sentences at a time.
+        "audio export FILE [DIRECTORY]" instead renders the audio for
+        every line of FILE into DIRECTORY (default: pystone_audio).
+        "--voice NAME" picks another Reverso voice, e.g. Heather22k."""
+        args = arg.split()
+        voice = None
+        if "--voice" in args:
+            index = args.index("--voice")
+            if index + 1 >= len(args):
+                print("*** Usage: audio [--voice NAME] [export FILE [DIRECTORY]]")
+                return
+            voice = args[index + 1]
+            del args[index:index + 2]
+        if args and args[0] == "export":
+            return self._export_audio(args[1:], voice)
+        if self.translation:
+            # playsound is slow to import and only needed here.
+            from playsound import playsound
+            playsound(self.translate.audio_file(self.translation, voice=voice))
+        else:
+            return
+
+    def _export_audio(self, args, voice=None) -> None:
+        """Renders audio for every line of a file in parallel."""
+        if not args or len(args) > 2:
+            print("*** Usage: audio export FILE [DIRECTORY]")
+            return
+        if not self._check_configuration():
+            return
+        directory = args[1] if len(args) == 2 else "pystone_audio"
+        with open(args[0], "r", encoding="utf-8") as f:
+            phrases = [line.strip() for line in f if line.strip()]
+        from .audio import export_audio
+        from .executor import Executor
+        with Executor() as executor:
+            results = export_audio(self.translate, phrases, directory, executor,
+                                   voice=voice)
+        failed = [r for r in results if isinstance(r[2], Exception)]
+        for index, phrase, e in failed:
+            self.log.warning(f"{index}: {phrase}: {e}")
+        self.log.info(
+            f"Exported {len(results) - len(failed)} of {len(results)} files to {directory}")
+        return
+
+    def do_stats(self, arg) -> None:
+        """Prints request latencies, counters and cache hits for this
+        session. "stats prometheus" prints them in the Prometheus text
+        format instead."""
+        if arg.strip() == "prometheus":
+            print(metrics.to_prometheus(), end="")
+            return
+        for (name, labels), histogram in sorted(metrics.histograms.items()):
+            labels = " ".join(f"{v}" for _, v in labels)
+            self.log.info(
+                f"{name} {labels}: n={histogram.count} "
+                f"p50={histogram.quantile(0.5) * 1000:.0f}ms "
+                f"p99={histogram.quantile(0.99) * 1000:.0f}ms")
+        for (name, labels), value in sorted(metrics.counters.items()):
+            labels = " ".join(f"{v}" for _, v in labels)
+            self.log.info(f"{name} {labels}: {value}")
+        self.log.info(f"cache: {self._cache_summary()}")
+        if self.translate.memory is not None:
+            stats = self.translate.memory.stats()
+            self.log.info(
+                f"translation memory: {stats['segments']} segments, {stats['hits']} "
+                f"exact hits, {stats['fuzzy_hits']} fuzzy hits, {stats['misses']} misses")
+        return
+
+    def do_reverse(self, arg) -> None:
+        """Swaps the source and target languages with each other. A source
+        of "auto" is replaced by the language last detected."""
+        source = self.translate.source
+        if is_auto(source):
+            if self.translate.detected is None:
+                self.log.warning("*** No language has been detected yet")
+                return
+            source = self.translate.detected.capitalize()
+        self.translate.source, self.translate.target = self.translate.target, source
+        return
+
+    def do_deepl(self, arg) -> None:
+        """Takes text from the source language to translate and prints
+        the translation to the console from Reverso."""
+        if not self._check_configuration():
+            return
+        if not arg and self.translation:
+            return self._print_translation()
+        self.translate.text = arg if arg else self.translate.text
+        self.translate.deepl()
+        self.result = self.translate.result
+        return self._print_translation()
+
+    def do_exit(self, arg) -> bool:
+        """Quits program."""
+        return True
+
+    def _check_configuration(self) -> int:
+        """Confirms if user has specified both a source language and
+        a target language."""
+        if not self.translate.source or not self.translate.target:
+            self.log.warning(
+                "You are missing a \033[38;5;202mtarget language\033[0m. Please check your settings by typing and entering \033[38;5;209msettings\033[0m.")
+            return 0
+        else:
+            return 1
+
+    def _cache_summary(self) -> str:
+        """Summarizes the cache counters for the settings command."""
+        if self.translate.cache is None:
+            return "disabled"
+        stats = self.translate.cache.stats()
+        return f"{stats['hits']} hits, {stats['misses']} misses"
+
+    def _print_translation(self) -> None:
+        """Prints current translation."""
+        self.log.info(f"""
+        {self.translate.text}
+
+        \033[38;5;141m{self.translation}\033[0m
+        """)
+        if self.translate.detected is not None:
+            self.log.info(f"        (detected: {self.translate.detected.capitalize()})\n")
+        match = self.translate.match
+        if match is not None and match["score"] < 1:
+            self.log.info(
+                f"        ({match['score']:.0%} translation memory match for: {match['text']})\n")
+        return
+
+    def _log_metric(self, name, value, labels) -> None:
+        """Logs every metric as it is recorded when debugging."""
+        if self.log.isEnabledFor(logging.DEBUG):
+            labels = ", ".join(f"{k}={v}" for k, v in labels.items())
+            self.debug(f"{name}{{{labels}}} {value}")
+        return
+
+    def debug(self, message) -> None:
+        self.log.debug(message)
+
+    def info(self, message) -> None:
+        self.log.info(message)
+
+    def warning(self, message) -> None:
+        self.log.warning(message)
+
+    def error(self, message) -> None:
+        self.log.error(message)
+
+
+def oneshot(args, cache=None, router=None, client=None, memory=None) -> int:
+    """Translates --text, or every line of stdin if there is no --text,
+    writes one JSON object per line as each translation is ready and
+    returns the exit status: 1 if any translation failed, 0 otherwise.
+    With a client, the translations come from a pystone daemon."""
+    from .executor import Executor
+
+    if client is not None:
+        def translate(text):
+            return client.translate(text, args.source, args.target)
+    else:
+        from .translate import Translate
+
+        def translate(text):
+            translate = Translate(text, args.source, args.target,
+                                  cache=cache, router=router, memory=memory)
+            executor.call("reverso", translate.translate)
+            return translate.to_dict()
+
+    def process(record):
+        try:
+            record.update(translate(record["text"]))
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+        return record
+
+    status = 0
+    with Executor() as executor:
+        if args.text:
+            results = [process({"text": args.text})]
+        else:
+            results = executor.map(process, (
+                {"index": index, "text": text} for index, text in
+                enumerate(read_lines(sys.stdin))))
+        for result in results:
+            status = 1 if "error" in result else status
+            sys.stdout.write(json.dumps(result, ensure_ascii=False) + "\n")
+            sys.stdout.flush()
+    return status
+
+
+def read_lines(f):
+    """Yields every non-empty line of f without its line ending."""
+    for line in f:
+        line = line.rstrip("\r\n")
+        if line.strip():
+            yield line
+
+
+def main() -> None:
+    """Command line arguments configuration."""
+    parser = argparse.ArgumentParser(prog="pystone", description="Translation options")
+    parser.add_argument("-s", "--source", type=str, help="the source language, or auto to detect it (default: English)",
+                        default="English", required=False, metavar="LANGUAGE")
+    parser.add_argument("-t", "--target", type=str,
+                        help="the target language", required=False, metavar="LANGUAGE")
+    parser.add_argument(
+        "--text", type=str, help="the text to be translated", required=False, metavar="TEXT")
+    parser.add_argument("--pool-size", type=int, help="the number of pooled connections per host (default: 10)",
+                        default=10, required=False, metavar="N")
+    parser.add_argument("--retries", type=int, help="the number of retries for failed requests (default: 3)",
+                        default=3, required=False, metavar="N")
+    parser.add_argument("--cache", type=str, help="the translation cache database (default: ~/.cache/pystone)",
+                        required=False, metavar="FILE")
+    parser.add_argument("--no-cache", help="do not cache translations",
+                        action="store_true")
+    parser.add_argument("-v", "--verbose", help="log every request and its timings",
+                        action="store_true")
+    parser.add_argument("--timeout", type=float, help="the number of seconds to wait for a provider to answer",
+                        required=False, metavar="SECONDS")
+    parser.add_argument("--failover", help="fall back to DeepL when Reverso fails",
+                        action="store_true")
+    parser.add_argument("--hedge", type=float, help="also ask DeepL if Reverso hasn't answered after SECONDS",
+                        required=False, metavar="SECONDS")
+    parser.add_argument("--json", help="translate --text, or each line of stdin, print JSON lines and exit",
+                        action="store_true")
+    parser.add_argument("--memory", type=str, help="a TMX or CSV translation memory to check before translating (repeatable)",
+                        action="append", metavar="FILE")
+    parser.add_argument("--fuzzy", type=float, help="the minimum similarity of translation memory matches, 1 for exact matches only (default: 0.9)",
+                        default=0.9, metavar="SCORE")
+    parser.add_argument("--learn", type=int, help="add up to N translations fetched while running to the translation memory, 0 for none (default: 10000)",
+                        default=10000, metavar="N")
+    parser.add_argument("--server", type=str, help="translate through the pystone daemon at ADDRESS (implies --json)",
+                        required=False, metavar="ADDRESS")
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND")
+    batch_parser = subparsers.add_parser(
+        "batch", help="translate many texts from a file or stdin")
+    batch_parser.add_argument("-s", "--source", type=str, help="the source language, or auto to detect it",
+                              default=argparse.SUPPRESS, metavar="LANGUAGE")
+    batch_parser.add_argument("-t", "--target", type=str, help="the target language",
+                              default=argparse.SUPPRESS, metavar="LANGUAGE")
+    batch_parser.add_argument("input", type=str, help="the input file (default: stdin)",
+                              nargs="?", metavar="FILE")
+    batch_parser.add_argument("-f", "--format", type=str, help="the input format (default: guessed from FILE)",
+                              choices=batch.FORMATS, metavar="FORMAT")
+    batch_parser.add_argument("--field", type=str, help="the JSONL key or CSV column holding the text (default: text)",
+                              default="text", metavar="NAME")
+    batch_parser.add_argument("-p", "--provider", type=str, help="the translation provider (default: reverso)",
+                              choices=["reverso", "deepl"], default="reverso", metavar="PROVIDER")
+    batch_parser.add_argument("-o", "--output", type=str, help="the output JSONL file (default: stdout)",
+                              metavar="FILE")
+    batch_parser.add_argument("--errors", type=str, help="the JSONL file for failed records (default: stderr)",
+                              metavar="FILE")
+    batch_parser.add_argument("-w", "--workers", type=int, help="the number of concurrent requests (default: 4)",
+                              default=4, metavar="N")
+    batch_parser.add_argument("--rate", type=float, help="the maximum requests per second to the provider",
+                              metavar="RATE")
+    batch_parser.add_argument("--checkpoint", type=str, help="the file used to resume an interrupted batch",
+                              metavar="FILE")
+    batch_parser.add_argument("-j", "--processes", type=int, help="the number of worker processes, each with --workers threads (default: 1)",
+                              default=1, metavar="N")
+    batch_parser.add_argument("--shard-size", type=int, help="the number of lines or records sent to a worker process at a time (default: 1000)",
+                              default=1000, metavar="N")
+    document_parser = subparsers.add_parser(
+        "document", help="translate a document, only sending sentences that changed since the last run")
+    document_parser.add_argument("-s", "--source", type=str, help="the source language, or auto to detect it",
+                                 default=argparse.SUPPRESS, metavar="LANGUAGE")
+    document_parser.add_argument("-t", "--target", type=str, help="the target language",
+                                 default=argparse.SUPPRESS, metavar="LANGUAGE")
+    document_parser.add_argument("input", type=str, help="the document to translate",
+                                 metavar="FILE")
+    document_parser.add_argument("-o", "--output", type=str, help="the translated document (default: stdout)",
+                                 metavar="FILE")
+    document_parser.add_argument("-p", "--provider", type=str, help="the translation provider (default: reverso)",
+                                 choices=["reverso", "deepl"], default="reverso", metavar="PROVIDER")
+    document_parser.add_argument("--state", type=str, help="the sentence translations kept between runs (default: OUTPUT.pystone.json, or FILE.pystone.json)",
+                                 metavar="FILE")
+    serve_parser = subparsers.add_parser(
+        "serve", help="run a translation daemon that keeps sessions and caches warm")
+    serve_parser.add_argument("--listen", type=str, help=f"HOST:PORT or a Unix socket path to listen on (default: {SERVER_ADDRESS})",
+                              default=SERVER_ADDRESS, metavar="ADDRESS")
+    args = parser.parse_args()
+    if args.server:
+        if not args.target:
+            parser.error("--server requires a target language")
+        from .server import Client
+        client = Client(args.server, timeout=args.timeout)
+        sys.exit(oneshot(args, client=client))
+    from .cache import SQLiteCache, TranslationCache
+    from .providers import Router
+    from .session import configure
+    configure(pool_maxsize=args.pool_size, retries=args.retries)
+    cache = None if args.no_cache else TranslationCache(SQLiteCache(args.cache))
+    memory = None
+    if args.memory:
+        from .memory import TranslationMemory
+        memory = TranslationMemory(threshold=args.fuzzy, learn=args.learn)
+        for path in args.memory:
+            try:
+                memory.load(path, args.source, args.target)
+            except (OSError, ValueError, SyntaxError) as e:
+                parser.error(f"cannot load translation memory {path}: {e}")
+    if args.command == "batch":
+        if not args.target:
+            parser.error("batch requires a target language")
+        if args.processes > 1:
+            from . import sharded
+            return sharded.main(args, memory=memory)
+        return batch.main(args, cache=cache, memory=memory)
+    router = None
+    if args.failover or args.hedge is not None:
+        router = Router(timeout=args.timeout, hedge_after=args.hedge)
+    elif args.timeout is not None:
+        router = Router(["reverso"], timeout=args.timeout)
+    if args.command == "document":
+        if not args.target:
+            parser.error("document requires a target language")
+        from . import incremental
+        return incremental.main(args, cache=cache, router=router, memory=memory)
+    if args.command == "serve":
+        from . import server
+        return server.main(args, cache=cache, router=router, memory=memory)
+    if args.json or (args.text and args.target):
+        if not args.target:
+            parser.error("--json requires a target language")
+        sys.exit(oneshot(args, cache=cache, router=router, memory=memory))
+    if platform.system() == "Windows":
+        os.system("color")
+    level = logging.DEBUG if args.verbose else logging.INFO
+    PyStone(args, cache=cache, router=router, level=level,
+            memory=memory).cmdloop()
@@ -5,6 +5,12 @@ DEEPL_LANGS = [
 REGIONAL_VARIANTS = [
     "en-US", "en-GB", "pt-PT", "pt-BR"]
 
+# Maximum number of characters Reverso accepts in a single request.
+REVERSO_CHAR_LIMIT = 800
+
+# Roughly how many characters Reverso's voices read before stopping.
+REVERSO_AUDIO_CHAR_LIMIT = 150
+
 LANGUAGES = {
     "arabic": {
         "deepl": "",
@@ -82,3 +88,6 @@ LANGUAGES = {
         "reverso_voice": "Ipek22k"
     }
 }
+
+# Where "pystone serve" listens, and "--server" connects, by default.
+SERVER_ADDRESS = "127.0.0.1:8765"
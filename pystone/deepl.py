@@ -2,114 +2,175 @@ import json
 import math
 import time
 
-import requests
+from .providers import Provider, StreamedBody, register
 
-from .languages import Languages
 
-
-class DeepL:
+@register
+class DeepL(Provider):
+    name = "deepl"
     api = "https://www2.deepl.com/jsonrpc"
+    headers = {
+        "content-type": "application/json",
+        "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/89.0.4371.0 Safari/537.36"
+    }
+
+    # Limits for a single LMT_handle_jobs request.
+    max_jobs = 50
+    max_chars = 5000
 
-    def __init__(self, text, source, target, s=None):
-        self.text = text
-        self.source = source
-        self.target = target
-        self.s = s
+    # Number of neighboring sentences sent as context with each sentence.
+    context_before = 5
+    context_after = 1
+    # Whether to send LMT_handle_jobs bodies with chunked transfer encoding
+    # as they are encoded instead of building them in memory first.
+    chunked = False
+
+    def __init__(self, text, source, target, s=None, context_before=None,
+                 context_after=None, chunked=None, compress=None):
+        super().__init__(text, source, target, s=s)
+        if context_before is not None:
+            self.context_before = context_before
+        if context_after is not None:
+            self.context_after = context_after
+        if chunked is not None:
+            self.chunked = chunked
+        if compress is not None:
+            self.compress = compress
 
     def deepl(self) -> dict:
-        """The central method to the DeepL class that establishes a common
+        """The central method to the DeepL class that reuses the pooled
         Session object, sets the language abbreviations for the DeepL API,
-        retrieves a response from the DeepL API endpoint, splits the user
-        text input into sentences through the DeepL API endpoint, organizes
-        output to send to DeepL API endpoint, parses the final response
-        from the Reverso API endpoint, and then returns the parsed response."""
-        self.s = self.create_session()
+        splits the user text input into sentences through the DeepL API
+        endpoint, organizes output to send to DeepL API endpoint, retrieves
+        and parses the final response from the DeepL API endpoint, and then
+        returns the parsed response."""
+        return self.deepl_many([self.text])[0]
+
+    def translate(self) -> dict:
+        return {**self.deepl(), "alternatives": None}
+
+    def deepl_many(self, texts) -> list:
+        """Translates several texts at once. All of them are split into
+        sentences with a single request, and their jobs are packed into as
+        few LMT_handle_jobs requests as max_jobs and max_chars allow. The
+        translations are then mapped back to the text they came from.
+        Returns one parsed response per text, in order."""
+        self.s = self.s or self.create_session()
         self.set_languages()
-        response = self.split_sentences()
-        splitted_texts = response["result"]["splitted_texts"][0]
-        jobs = self.get_jobs(splitted_texts)
-        response = self.get_deepl_translation_response(jobs)
-        parsed_response = self.parse_deepl_translation_response(response)
-        return parsed_response
-
-    def create_session(self) -> requests.sessions.Session:
-        """Creates a Session object."""
-        headers = {
-            "accept-encoding": "gzip, deflate, br",
-            "content-type": "application/json",
-            "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/89.0.4371.0 Safari/537.36"
-        }
-        s = requests.Session()
-        s.headers.update(headers)
-        return s
-
-    def set_languages(self) -> None:
-        """Sets appropriate language abbreviations for use for the DeepL API."""
-        source = Languages(self.source)
-        source_language = source.get_language()
-        self.source = source.deepl_get_abbrv(source_language)
-        target = Languages(self.target)
-        target_language = target.get_language()
-        self.target = target.deepl_get_abbrv(target_language)
+        documents = self.get_documents(self.split_sentences(texts))
+        translations = [[] for _ in documents]
+        for packed in self.pack_jobs(documents):
+            response = self.get_deepl_translation_response(
+                [job for _, job in packed])
+            self.add_translations(translations, packed, response)
+        return self.parse_translations(translations)
+
+    def get_documents(self, response) -> list:
+        """The jobs of every text split into sentences by response."""
+        return [self.get_jobs(sentences)
+                for sentences in response["result"]["splitted_texts"]]
+
+    @staticmethod
+    def add_translations(translations, packed, response) -> None:
+        """Appends the translation of each packed job to the list of the
+        document it belongs to."""
+        results = response["result"]["translations"]
+        if len(results) != len(packed):
+            raise ValueError(f"DeepL returned {len(results)} translations "
+                             f"for {len(packed)} sentences")
+        for (index, _), result in zip(packed, results):
+            translations[index].append(result)
         return
 
-    def split_sentences(self) -> dict:
-        """Intelligently splits user text input into sentences using the
-        DeepL API endpoint."""
+    def parse_translations(self, translations) -> list:
+        """Parses each document's translations into a parsed response."""
+        with self.timer("parse"):
+            return [self.parse_deepl_translation_response(
+                {"result": {"translations": t}}) for t in translations]
+
+    def pack_jobs(self, documents) -> list:
+        """Groups the jobs of several documents into requests holding at
+        most max_jobs jobs and about max_chars characters each. Every job
+        is paired with the index of the document it belongs to."""
+        batches, packed, size = [], [], 0
+        for index, jobs in enumerate(documents):
+            for job in jobs:
+                job_size = self.job_size(job)
+                if packed and (len(packed) >= self.max_jobs or
+                               size + job_size > self.max_chars):
+                    batches.append(packed)
+                    packed, size = [], 0
+                packed.append((index, job))
+                size += job_size
+        if packed:
+            batches.append(packed)
+        return batches
+
+    @staticmethod
+    def job_size(job) -> int:
+        """Counts the characters a job adds to a request."""
+        return (len(job["raw_en_sentence"]) +
+                sum(map(len, job["raw_en_context_before"])) +
+                sum(map(len, job["raw_en_context_after"])))
+
+    def get_split_sentences_payload(self, texts=None) -> str:
+        """Builds the JSON body for splitting user text input, or several
+        texts, into sentences."""
         payload = {
             "jsonrpc": "2.0",
             "method": "LMT_split_into_sentences",
             "params": {
-                "texts": [self.text],
+                "texts": texts if texts is not None else [self.text],
                 "lang": {
                     "lang_user_selected": "auto",
                     "user_preferred_langs": []
                 }
             }
         }
-        payload = json.dumps(payload)
-        with self.s.post(self.api, data=payload) as r:
+        return json.dumps(payload)
+
+    def split_sentences(self, texts=None) -> dict:
+        """Intelligently splits user text input, or several texts, into
+        sentences using the DeepL API endpoint."""
+        payload = self.get_split_sentences_payload(texts)
+        with self.request("POST", self.api, data=payload,
+                          headers=self.headers, stream=True) as r:
             if r.ok:
-                return r.json()
+                return self.read_json(r)
             else:
                 r.raise_for_status()
 
     def get_jobs(self, texts) -> list:
         """Appropriately organizes user text input for data to be sent to
-        the DeepL API endpoint."""
-        num_texts = len(texts)
-        jobs = []
-        count = 0
-        while count < num_texts:
-            job = {
+        the DeepL API endpoint. Each sentence is sent with a window of at
+        most context_before preceding and context_after following
+        sentences, so the jobs grow linearly with the number of sentences."""
+        if len(texts) == 1:
+            return [{
                 "kind": "default",
-                "raw_en_sentence": "",
+                "raw_en_sentence": texts[0],
                 "raw_en_context_before": [],
                 "raw_en_context_after": [],
-                "preferred_num_beams": 4
-            }
-            if num_texts == 1:
-                job["raw_en_sentence"] = texts[count]
-                job["quality"] = "fast"
-                jobs.append(job)
-            elif num_texts - 1 == count:
-                job["raw_en_sentence"] = texts[count]
-                job["raw_en_context_before"] = [texts[i]
-                                                for i in range(1 + count - 1)]
-                job["preferred_num_beams"] = 1
-                jobs.append(job)
-            else:
-                job["raw_en_sentence"] = texts[count]
-                job["raw_en_context_before"] = [texts[i]
-                                                for i in range(1 + count - 1)]
-                job["raw_en_context_after"] = [texts[count + 1]]
-                job["preferred_num_beams"] = 1
-                jobs.append(job)
-            count += 1
+                "preferred_num_beams": 4,
+                "quality": "fast"
+            }]
+        jobs = []
+        for i, sentence in enumerate(texts):
+            jobs.append({
+                "kind": "default",
+                "raw_en_sentence": sentence,
+                "raw_en_context_before": texts[max(0, i - self.context_before):i],
+                "raw_en_context_after": texts[i + 1:i + 1 + self.context_after],
+                "preferred_num_beams": 1
+            })
         return jobs
 
-    def get_deepl_translation_response(self, jobs) -> dict:
-        """Sends user text input to DeepL API endpoint."""
+    def get_deepl_translation_payload(self, jobs) -> str:
+        """Builds the JSON body for translating jobs."""
+        return json.dumps(self.get_deepl_translation_params(jobs))
+
+    def get_deepl_translation_params(self, jobs) -> dict:
+        """Builds the JSON-RPC request for translating jobs."""
         payload = {
             "jsonrpc": "2.0",
             "method": "LMT_handle_jobs",
@@ -132,17 +193,43 @@ class DeepL:
                 0, "DE")
         if len(jobs) > 1:
             payload["params"]["priority"] = 1
-        payload = json.dumps(payload)
-        with self.s.post(self.api, data=payload) as r:
+        return payload
+
+    @staticmethod
+    def stream_payload(payload, chunk_size=65536):
+        """Encodes payload as JSON, yielding it in chunks of about
+        chunk_size bytes without ever building the whole body."""
+        buffer, size = [], 0
+        for part in json.JSONEncoder().iterencode(payload):
+            buffer.append(part)
+            size += len(part)
+            if size >= chunk_size:
+                yield "".join(buffer).encode()
+                buffer, size = [], 0
+        if buffer:
+            yield "".join(buffer).encode()
+
+    def get_deepl_translation_response(self, jobs) -> dict:
+        """Sends user text input to DeepL API endpoint."""
+        if self.chunked:
+            payload = StreamedBody(self.stream_payload,
+                                   self.get_deepl_translation_params(jobs))
+        else:
+            payload = self.get_deepl_translation_payload(jobs)
+        with self.request("POST", self.api, data=payload,
+                          headers=self.headers, stream=True) as r:
             if r.ok:
-                return r.json()
+                return self.read_json(r)
             else:
                 r.raise_for_status()
 
     def parse_deepl_translation_response(self, response) -> dict:
         """Parses the response from the DeepL API endpoint."""
         translations = response["result"]["translations"]
-        if len(translations) > 1:
+        if not translations:
+            translation = ""
+            examples = []
+        elif len(translations) > 1:
             postprocessed_sentences = [
                 t["beams"][0]["postprocessed_sentence"] for t in translations]
             translation = " ".join(postprocessed_sentences)
@@ -0,0 +1,293 @@
+import collections
+import functools
+import math
+import re
+
+from .languages import LanguageError
+
+# The source language that asks for the language of each text to be
+# detected.
+AUTO = "auto"
+
+# Languages written in a script of their own, and the characters of it.
+SCRIPTS = [
+    ("japanese", re.compile(r"[぀-ヿ]")),
+    ("chinese", re.compile(r"[一-鿿㐀-䶿]")),
+    ("arabic", re.compile(r"[؀-ۿݐ-ݿ]")),
+    ("hebrew", re.compile(r"[֐-׿]")),
+    ("russian", re.compile(r"[Ѐ-ӿ]")),
+]
+
+# Text in each language that uses the Latin script, from which its n-gram
+# profile is built: its most frequent words, then a few sentences.
+SAMPLES = {
+    "dutch": """
+        de het een en van in is dat op te zijn niet met voor hij ik je
+        jij jou u we wij ze zij hun er maar om aan ook als bij nog wel
+        geen dan uit kan mijn dit die wat naar hoe waar wie waarom heb
+        hebben was waren worden wordt door tot over meer of zo al moet
+        heel veel goed dag nacht morgen vandaag ja nee hou houden broer
+        zus naam heet kost kosten
+        Alle mensen worden vrij en gelijk in waardigheid en rechten geboren.
+        Zij zijn begiftigd met verstand en geweten, en behoren zich jegens
+        elkander in een geest van broederschap te gedragen. Hallo, hoe gaat
+        het met je? Hoe laat is het? Waar is het station? Ik wil graag een
+        kopje koffie, alstublieft. Dank je wel. Het weer is vandaag mooi. Ik
+        begrijp het niet. Kun je mij helpen? Wij hebben het huis gisteren
+        gekocht en de kinderen spelen in de tuin. Het is een goed idee om
+        het boek eerst te lezen voordat je de film bekijkt. Er zijn veel
+        mensen die niet weten wat ze moeten doen.
+    """,
+    "english": """
+        the be to of and a in that have it for not on with he as you do
+        at this but his by from they we say her she or an will my one
+        all would there their what so up out if about who get which go
+        me when make can like time no just him know take people into
+        year your good some could them see other than then now look only
+        come its over think also back after use two how our work first
+        well way even new want because any these give day most us is are
+        was were has had been my name brother sister cost costs tomorrow
+        night love
+        All human beings are born free and equal in dignity and rights. They
+        are endowed with reason and conscience and should act towards one
+        another in a spirit of brotherhood. Hello, how are you? What time is
+        it? Where is the train station? I would like a cup of coffee,
+        please. Thank you very much. The weather is nice today. I don't
+        understand. Can you help me? We bought the house yesterday and the
+        children are playing in the garden. It is a good idea to read the
+        book first before you watch the film. There are many people who do
+        not know what they should do with their time.
+    """,
+    "french": """
+        le la les de des du un une et est en que qui dans pour pas sur
+        au aux avec ce cette il elle ils elles je tu nous vous on ne se
+        sa son ses leur mais ou où comme plus tout bien très sans être
+        avoir fait faire dit peut mon ma mes ton ta moi toi oui non
+        bonjour merci nuit demain frère sœur nom appelle coûte combien
+        aime
+        Tous les êtres humains naissent libres et égaux en dignité et en
+        droits. Ils sont doués de raison et de conscience et doivent agir
+        les uns envers les autres dans un esprit de fraternité. Bonjour,
+        comment ça va ? Quelle heure est-il ? Où est la gare ? Je voudrais
+        une tasse de café, s'il vous plaît. Merci beaucoup. Il fait beau
+        aujourd'hui. Je ne comprends pas. Pouvez-vous m'aider ? Nous avons
+        acheté la maison hier et les enfants jouent dans le jardin. C'est une
+        bonne idée de lire le livre avant de regarder le film. Il y a
+        beaucoup de gens qui ne savent pas ce qu'ils doivent faire.
+    """,
+    "german": """
+        der die das und ist nicht zu den von mit sich des auf für im dem
+        ein eine einen einem als auch es an er sie so wie aus bei nach
+        wird hat sind war noch nur oder aber vor zur bis mehr durch man
+        sein ich du wir ihr mein dein heute morgen nacht gute guten
+        bruder schwester heiße heißt kostet viel wie liebe dich
+        zusammen immer schon wieder dann denn doch jetzt hier dort
+        kein keine habe haben wurde werden kann können muss müssen
+        will über unter zwischen gegen ohne etwas alles dieser diese
+        zeit jahr jahre leben arbeit morgen tag woche
+        Alle Menschen sind frei und gleich an Würde und Rechten geboren. Sie
+        sind mit Vernunft und Gewissen begabt und sollen einander im Geist
+        der Brüderlichkeit begegnen. Hallo, wie geht es dir? Wie spät ist
+        es? Wo ist der Bahnhof? Ich möchte bitte eine Tasse Kaffee. Vielen
+        Dank. Das Wetter ist heute schön. Ich verstehe das nicht. Kannst du
+        mir helfen? Wir haben das Haus gestern gekauft und die Kinder spielen
+        im Garten. Es ist eine gute Idee, zuerst das Buch zu lesen, bevor man
+        sich den Film ansieht. Es gibt viele Leute, die nicht wissen, was sie
+        tun sollen. Straße, groß, schließlich, weiß.
+    """,
+    "italian": """
+        il lo la i gli le di da in con su per tra fra un una uno e è non
+        che chi sono sei siamo ha hanno ho mi ti ci si ma anche come più
+        molto questo questa quello mio mia tuo suo nostro del della dei
+        delle nel nella al alla ciao buongiorno grazie notte domani
+        fratello sorella chiamo costa quanto amo
+        Tutti gli esseri umani nascono liberi ed eguali in dignità e
+        diritti. Essi sono dotati di ragione e di coscienza e devono agire
+        gli uni verso gli altri in spirito di fratellanza. Ciao, come stai?
+        Che ore sono? Dov'è la stazione? Vorrei una tazza di caffè, per
+        favore. Grazie mille. Oggi il tempo è bello. Non capisco. Mi puoi
+        aiutare? Abbiamo comprato la casa ieri e i bambini giocano nel
+        giardino. È una buona idea leggere prima il libro e poi guardare il
+        film. Ci sono molte persone che non sanno che cosa devono fare.
+    """,
+    "polish": """
+        i w nie na się z że do to jest jak co ale po tak od za o dla już
+        czy tylko jego jej ich mój moja moje twój być był była są jestem
+        jesteś mamy ma mam który która które gdzie kiedy dlaczego bardzo
+        dobrze dzień dobry dobranoc noc jutro brat siostra nazywam
+        kosztuje ile kocham cię jutra
+        Wszyscy ludzie rodzą się wolni i równi pod względem swej godności i
+        swych praw. Są oni obdarzeni rozumem i sumieniem i powinni postępować
+        wobec innych w duchu braterstwa. Cześć, jak się masz? Która jest
+        godzina? Gdzie jest dworzec? Poproszę filiżankę kawy. Dziękuję
+        bardzo. Dzisiaj jest ładna pogoda. Nie rozumiem. Czy możesz mi
+        pomóc? Wczoraj kupiliśmy dom, a dzieci bawią się w ogrodzie. Dobrym
+        pomysłem jest najpierw przeczytać książkę, zanim obejrzy się film.
+        Jest wielu ludzi, którzy nie wiedzą, co powinni zrobić.
+    """,
+    "portuguese": """
+        o a os as de do da dos das em no na nos nas um uma e é não que
+        com por para se mais como mas ao ele ela eles elas eu você nós
+        meu minha seu sua muito bem sim obrigado obrigada boa bom noite
+        dia amanhã irmão irmã nome custa quanto amo até
+        está estou estão são foi ser ter tem têm fazer isso isto
+        esse essa aqui onde quando porque também ainda depois agora
+        sempre nunca nada tudo então lendo fazendo casa tempo vez
+        Todos os seres humanos nascem livres e iguais em dignidade e em
+        direitos. Dotados de razão e de consciência, devem agir uns para com
+        os outros em espírito de fraternidade. Olá, como você está? Que
+        horas são? Onde fica a estação de trem? Eu gostaria de uma xícara de
+        café, por favor. Muito obrigado. O tempo está bom hoje. Não entendo.
+        Você pode me ajudar? Nós compramos a casa ontem e as crianças estão
+        brincando no jardim. É uma boa ideia ler o livro antes de ver o
+        filme. Há muitas pessoas que não sabem o que devem fazer. Ação,
+        coração, não, são, também.
+    """,
+    "romanian": """
+        și în de la pe cu a al ale un o este sunt nu că care ce mai sau
+        dar din pentru prin acest această eu tu el ea noi voi ei ele meu
+        mea tău ta foarte bine da mulțumesc bună noapte mâine frate soră
+        numesc costă cât iubesc te mă
+        Toate ființele umane se nasc libere și egale în demnitate și în
+        drepturi. Ele sunt înzestrate cu rațiune și conștiință și trebuie să
+        se comporte unele față de altele în spiritul fraternității. Bună, ce
+        mai faci? Cât este ceasul? Unde este gara? Aș dori o ceașcă de
+        cafea, vă rog. Mulțumesc foarte mult. Vremea este frumoasă astăzi.
+        Nu înțeleg. Mă poți ajuta? Am cumpărat casa ieri și copiii se joacă
+        în grădină. Este o idee bună să citești mai întâi cartea înainte de
+        a vedea filmul. Sunt mulți oameni care nu știu ce trebuie să facă.
+    """,
+    "spanish": """
+        el la los las de del y en que un una es no se por con para lo
+        como más pero su sus al le ya o este esta sí porque muy también
+        me mi mis tu te yo él ella nosotros hay bien hola gracias buenas
+        noches mañana hermano hermana llamo cuesta cuánto quiero
+        Todos los seres humanos nacen libres e iguales en dignidad y
+        derechos y, dotados como están de razón y conciencia, deben
+        comportarse fraternalmente los unos con los otros. Hola, ¿cómo
+        estás? ¿Qué hora es? ¿Dónde está la estación de tren? Quisiera una
+        taza de café, por favor. Muchas gracias. Hoy hace buen tiempo. No
+        entiendo. ¿Me puedes ayudar? Compramos la casa ayer y los niños
+        están jugando en el jardín. Es una buena idea leer el libro antes de
+        ver la película. Hay muchas personas que no saben lo que tienen que
+        hacer. Mañana, año, señor.
+    """,
+    "turkish": """
+        ve bir bu da de için ile ne çok daha gibi ama ben sen o biz siz
+        onlar benim senin onun var yok değil mi mı mu mü evet hayır iyi
+        günaydın teşekkürler gece geceler yarın kardeşim adım ne kadar
+        seviyorum görüşürüz nerede nasıl
+        şey her kendi sonra önce şimdi bugün zaman gün yıl olarak
+        olan oldu olur kadar çünkü eğer bile hem diye değil mi şu
+        lütfen burada orada bunu şunu onu bana sana ona gidiyorum
+        geliyor yapıyor istiyorum biliyorum
+        Bütün insanlar hür, haysiyet ve haklar bakımından eşit doğarlar.
+        Akıl ve vicdana sahiptirler ve birbirlerine karşı kardeşlik
+        zihniyeti ile hareket etmelidirler. Merhaba, nasılsın? Saat kaç?
+        Tren istasyonu nerede? Bir fincan kahve istiyorum, lütfen. Çok
+        teşekkür ederim. Bugün hava güzel. Anlamıyorum. Bana yardım eder
+        misin? Evi dün satın aldık ve çocuklar bahçede oynuyorlar. Filmi
+        izlemeden önce kitabı okumak iyi bir fikir. Ne yapmaları gerektiğini
+        bilmeyen birçok insan var.
+    """,
+}
+
+WORD = re.compile(r"[^\W\d_]+")
+
+
+def ngrams(text, n=3):
+    """Yields every word in text and its 1- to n-grams, lowercased and
+    with the word boundaries marked by spaces."""
+    for word in WORD.findall(text.casefold()):
+        word = f" {word} "
+        if len(word) > n:
+            yield word
+        for size in range(1, n + 1):
+            for i in range(len(word) - size + 1):
+                gram = word[i:i + size]
+                if gram != " ":
+                    yield gram
+
+
+@functools.lru_cache(maxsize=None)
+def profiles() -> dict:
+    """Builds the log-probability of every n-gram in each sample, and of
+    an unseen n-gram, once, on first use."""
+    counts = {name: collections.Counter(ngrams(text))
+              for name, text in SAMPLES.items()}
+    vocabulary = len(set().union(*counts.values()))
+    built = {}
+    for name, counter in counts.items():
+        total = sum(counter.values()) + vocabulary
+        built[name] = ({gram: math.log((count + 1) / total)
+                        for gram, count in counter.items()},
+                       math.log(1 / total))
+    return built
+
+
+def script(text):
+    """Gets the language whose script most of text's letters are in, or
+    None if they are mostly Latin. Kana mark Japanese even among kanji."""
+    letters = sum(1 for c in text if c.isalpha())
+    for name, pattern in SCRIPTS:
+        found = len(pattern.findall(text))
+        if found and (name == "japanese" or found * 2 >= letters):
+            return name
+    return None
+
+
+def scores(text) -> dict:
+    """Gets the probability that text is in each language written in the
+    Latin script."""
+    grams = collections.Counter(ngrams(text))
+    if not grams:
+        return {}
+    logs = {}
+    for name, (logprobs, unseen) in profiles().items():
+        logs[name] = sum(count * logprobs.get(gram, unseen)
+                         for gram, count in grams.items())
+    # Average over the n-grams so long texts don't make every decision
+    # look certain, then normalize.
+    total = sum(grams.values())
+    best = max(logs.values())
+    weights = {name: math.exp((log - best) / total * 10) for name, log in logs.items()}
+    norm = sum(weights.values())
+    return {name: weight / norm for name, weight in weights.items()}
+
+
+@functools.lru_cache(maxsize=4096)
+def detect(text) -> str:
+    """Gets the lowercase English name of the language text is written in,
+    like resolve. Raises LanguageError if text has no letters."""
+    name = script(text)
+    if name is not None:
+        return name
+    probabilities = scores(text)
+    if not probabilities:
+        raise LanguageError(f"cannot detect the language of: {text!r}")
+    return max(probabilities, key=probabilities.get)
+
+
+def detect_many(texts) -> list:
+    """Detects the language of every text. Texts without letters are
+    given None instead of raising."""
+    detected = []
+    for text in texts:
+        try:
+            detected.append(detect(text))
+        except LanguageError:
+            detected.append(None)
+    return detected
+
+
+def group_by_language(texts) -> dict:
+    """Maps each detected language to the indexes of its texts, in order,
+    so texts can be sent to a provider one language pair at a time."""
+    groups = collections.defaultdict(list)
+    for index, language in enumerate(detect_many(texts)):
+        groups[language].append(index)
+    return dict(groups)
+
+
+def is_auto(language) -> bool:
+    return bool(language) and language.strip().lower() == AUTO
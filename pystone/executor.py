@@ -0,0 +1,252 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .metrics import metrics
+
+# Default requests per second allowed for each provider.
+RATES = {
+    "reverso": 5.0,
+    "deepl": 1.0
+}
+
+# The token buckets shared by every Executor in the process that doesn't
+# set its own rate for a provider, so that separate callers together stay
+# under the provider's rate limit.
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def shared_bucket(provider) -> "TokenBucket":
+    """Gets the process-wide token bucket of provider, creating it at
+    the provider's default rate if needed."""
+    with _buckets_lock:
+        if provider not in _buckets:
+            _buckets[provider] = TokenBucket(RATES[provider])
+        return _buckets[provider]
+
+
+def share_buckets(buckets) -> None:
+    """Makes buckets, which map providers to token buckets such as ones
+    served to several processes, the process-wide buckets of those
+    providers."""
+    with _buckets_lock:
+        _buckets.update(buckets)
+    return
+
+
+class TokenBucket:
+    """A thread-safe token bucket that adapts its rate to 429 responses by
+    halving it, then slowly climbs back up to the configured rate."""
+
+    def __init__(self, rate, capacity=None, min_rate=0.1):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.paused_until = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Blocks until a token is available and consumes it."""
+        while True:
+            wait = self._take()
+            if not wait:
+                return
+            time.sleep(wait)
+
+    def try_acquire(self) -> bool:
+        """Consumes a token if one is available now, without blocking."""
+        return not self._take()
+
+    def paused(self) -> bool:
+        """Whether calls are paused for a 429's Retry-After."""
+        return time.monotonic() < self.paused_until
+
+    def _take(self) -> float:
+        """Consumes a token and returns 0, or returns how many seconds to
+        wait before one may be available."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens +
+                              (now - self._updated) * self.rate)
+            self._updated = now
+            if now < self.paused_until:
+                return self.paused_until - now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+    def throttle(self, retry_after=None) -> None:
+        """Halves the rate and, if given, pauses for retry_after seconds."""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0.0
+            if retry_after:
+                self.paused_until = max(self.paused_until,
+                                        time.monotonic() + retry_after)
+        return
+
+    def recover(self) -> None:
+        """Additively raises the rate back towards its configured value."""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+        return
+
+
+class Allowance:
+    """Stands in for a token bucket during a fan-out of burst calls that
+    should all start at once. Each call takes a token from the bucket if
+    one is free and otherwise spends one of burst extra tokens instead of
+    waiting, so other users of the bucket are never given more than its
+    rate. Once the extra tokens are spent, or while the bucket is paused
+    by a 429, calls wait for the bucket like any other."""
+
+    def __init__(self, bucket, burst):
+        self.bucket = bucket
+        self.burst = burst
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.bucket.try_acquire():
+            return
+        with self._lock:
+            spend = self.burst > 0 and not self.bucket.paused()
+            if spend:
+                self.burst -= 1
+        if not spend:
+            self.bucket.acquire()
+        return
+
+    def throttle(self, retry_after=None) -> None:
+        with self._lock:
+            self.burst = 0
+        self.bucket.throttle(retry_after)
+        return
+
+    def recover(self) -> None:
+        self.bucket.recover()
+        return
+
+
+class Executor:
+    """Fans calls out over a thread pool while keeping each provider under
+    its own rate limit and retrying calls rejected with 429. Providers
+    draw from the process-wide token buckets unless rates sets their rate,
+    which gives this Executor buckets of its own. buckets can supply
+    existing token buckets, such as ones shared between processes, for
+    some providers."""
+
+    def __init__(self, max_workers=4, rates=None, retries=5, buckets=None):
+        self.max_workers = max_workers
+        self.rates = rates or {}
+        self.retries = retries
+        self.buckets = dict(buckets or {})
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    def bucket(self, provider) -> TokenBucket:
+        """Gets the token bucket for provider, creating it if needed."""
+        with self._lock:
+            if provider not in self.buckets and provider in self.rates:
+                self.buckets[provider] = TokenBucket(self.rates[provider])
+            elif provider not in self.buckets:
+                self.buckets[provider] = shared_bucket(provider)
+            return self.buckets[provider]
+
+    def allow_burst(self, provider, burst) -> None:
+        """Lets the next burst calls to provider through this Executor
+        start at once, without changing the token bucket it draws from."""
+        bucket = self.bucket(provider)
+        with self._lock:
+            self.buckets[provider] = Allowance(bucket, burst)
+        return
+
+    def call(self, provider, fn, *args, **kwargs):
+        """Calls fn under the rate limit of provider, backing off and
+        retrying when the provider answers with 429 Too Many Requests."""
+        bucket = self.bucket(provider)
+        attempt = 0
+        while True:
+            bucket.acquire()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                # requests.HTTPError, or any error carrying the response.
+                response = getattr(e, "response", None)
+                if getattr(response, "status_code", None) != 429 or attempt >= self.retries:
+                    raise
+                metrics.increment("pystone_retries_total",
+                                  provider=provider, reason="429")
+                bucket.throttle(self.retry_after(response, attempt))
+                attempt += 1
+                continue
+            bucket.recover()
+            return result
+
+    @staticmethod
+    def retry_after(response, attempt) -> float:
+        """Seconds to wait before retrying, honoring Retry-After."""
+        try:
+            return float(response.headers["retry-after"])
+        except (KeyError, ValueError):
+            return min(30.0, 2 ** attempt)
+
+    def submit(self, fn, *args, **kwargs):
+        """Schedules fn on the thread pool and returns its Future."""
+        return self._pool.submit(fn, *args, **kwargs)
+
+    def map(self, fn, iterable):
+        """Like the built-in map but runs fn concurrently. Results are
+        yielded in input order and at most twice max_workers items are in
+        flight at once, so memory stays bounded for long inputs. The input
+        is read on its own thread, so each result is yielded as soon as it
+        and the ones before it are done, even while a slow input such as a
+        pipe has not sent the next item yet."""
+        window = threading.Semaphore(self.max_workers * 2)
+        futures = queue.Queue()
+        stop = threading.Event()
+
+        def feed():
+            try:
+                for item in iterable:
+                    window.acquire()
+                    if stop.is_set():
+                        break
+                    futures.put(self._pool.submit(fn, item))
+            except Exception as e:
+                futures.put(e)
+            futures.put(None)
+
+        threading.Thread(target=feed, daemon=True).start()
+        try:
+            while True:
+                future = futures.get()
+                if future is None:
+                    return
+                if isinstance(future, Exception):
+                    raise future
+                result = future.result()
+                window.release()
+                yield result
+        finally:
+            stop.set()
+            window.release()
+            while not futures.empty():
+                future = futures.get()
+                if isinstance(future, Future):
+                    future.cancel()
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=True)
+        return
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import sys
+
+from .chunking import split_sentences, strip_chunk
+from .detection import AUTO, is_auto
+from .executor import Executor
+from .languages import resolve
+
+
+class IncrementalTranslator:
+    """Translates documents one sentence at a time and remembers each
+    sentence's translation under a hash of the sentence. Translating an
+    edited document again only sends its new and changed sentences
+    upstream and reassembles the rest from what it remembers. With a
+    path, the translations are kept in a JSON file between runs."""
+
+    def __init__(self, source, target, provider="reverso", path=None, s=None,
+                 executor=None, cache=None, router=None, memory=None):
+        self.source = source
+        self.target = target
+        self.provider = provider
+        self.path = path
+        self.s = s
+        self.executor = executor
+        self.cache = cache
+        self.router = router
+        self.memory = memory
+        self.translations = {}
+        # The hashes of the sentences translated since loading, which are
+        # the only ones saved.
+        self.used = set()
+        self.sent = 0
+        self.reused = 0
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.translations = json.load(f)["translations"]
+
+    def key(self, sentence) -> str:
+        """Hashes a sentence with the provider and language pair, ignoring
+        differences in whitespace."""
+        source = AUTO if is_auto(self.source) else resolve(self.source)
+        raw = json.dumps([self.provider, source, resolve(self.target),
+                          " ".join(sentence.split())], ensure_ascii=False)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def translate(self, text) -> str:
+        """Translates text, only sending the sentences that haven't been
+        translated before."""
+        units = [strip_chunk(sentence) for sentence in split_sentences(text)]
+        keys = [self.key(body) if body else None for _, body, _ in units]
+        missing = {}
+        for key, (_, body, _) in zip(keys, units):
+            if key is None:
+                continue
+            if key in self.translations or key in missing:
+                self.reused += 1
+            else:
+                missing[key] = body
+        self.sent += len(missing)
+        for key, translation in zip(missing, self.fetch(list(missing.values()))):
+            self.translations[key] = translation
+        self.used.update(key for key in keys if key is not None)
+        return "".join(
+            before + self.translations[key] + after if key is not None else before
+            for key, (before, _, after) in zip(keys, units))
+
+    def fetch(self, sentences) -> list:
+        """Translates sentences with the provider: DeepL packs them into as
+        few requests as it can, Reverso gets them concurrently."""
+        from .translate import Translate
+        if not sentences:
+            return []
+        if self.provider == "deepl":
+            translate = Translate(None, self.source, self.target, s=self.s,
+                                  cache=self.cache)
+            return [r["translation"] for r in translate.deepl_many(sentences)]
+
+        def translate(sentence):
+            translate = Translate(sentence, self.source, self.target, s=self.s,
+                                  cache=self.cache, router=self.router,
+                                  memory=self.memory)
+            translate.translate()
+            return translate.translation
+
+        executor = self.executor or Executor()
+        try:
+            return list(executor.map(
+                lambda sentence: executor.call("reverso", translate, sentence),
+                sentences))
+        finally:
+            if executor is not self.executor:
+                executor.shutdown()
+
+    def save(self) -> None:
+        """Atomically writes the translations of the sentences used since
+        loading to path, dropping those of deleted or edited sentences."""
+        if not self.path:
+            return
+        translations = {key: self.translations[key] for key in self.used}
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"translations": translations}, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+        return
+
+    def stats(self) -> dict:
+        return {"sent": self.sent, "reused": self.reused}
+
+
+def main(args, cache=None, router=None, memory=None) -> None:
+    """Runs the document subcommand."""
+    state = args.state or f"{args.output or args.input}.pystone.json"
+    translator = IncrementalTranslator(
+        args.source, args.target, provider=args.provider, path=state,
+        cache=cache, router=router, memory=memory)
+    with open(args.input, "r", encoding="utf-8", newline="") as f:
+        text = f.read()
+    translation = translator.translate(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as f:
+            f.write(translation)
+    else:
+        sys.stdout.write(translation)
+    translator.save()
+    stats = translator.stats()
+    print(f"{stats['sent']} sentences translated, {stats['reused']} reused",
+          file=sys.stderr)
+    return
@@ -1,38 +1,156 @@
+import functools
 import re
 import unicodedata
 
 from .constants import LANGUAGES
 
 
+class LanguageError(ValueError):
+    """Raised when a language can't be resolved unambiguously."""
+
+
+# ISO 639-1/2/3 codes and the names of each language in a few languages,
+# including its own. These are matched exactly, before any pattern.
+ALIASES = {
+    "arabic": [
+        "ar", "ara", "arb", "arabe", "arabisch", "arabo", "arabski", "arapca",
+        "العربية", "арабский"],
+    "chinese": [
+        "zh", "chi", "zho", "cmn", "chinois", "chino", "chinesisch", "cinese",
+        "chinski", "cince", "zhongwen", "中文", "汉语", "漢語", "普通话",
+        "китайский"],
+    "dutch": [
+        "nl", "dut", "nld", "nederlands", "neerlandais", "neerlandes",
+        "niederlandisch", "hollandisch", "olandese", "holandes", "hollandais",
+        "niderlandzki", "holenderski", "hollandaca", "flemish", "vlaams",
+        "голландский"],
+    "english": [
+        "en", "eng", "anglais", "ingles", "englisch", "inglese", "angielski",
+        "ingilizce", "engels", "английский"],
+    "french": [
+        "fr", "fra", "fre", "francais", "frances", "franzosisch", "francese",
+        "francuski", "fransizca", "frans", "французский"],
+    "german": [
+        "de", "ger", "deu", "deutsch", "allemand", "aleman", "tedesco",
+        "niemiecki", "almanca", "duits", "немецкий"],
+    "hebrew": [
+        "he", "heb", "iw", "ivrit", "hebreu", "hebreo", "hebraisch", "ebraico",
+        "hebrajski", "ibranice", "עברית", "иврит"],
+    "italian": [
+        "it", "ita", "italiano", "italien", "italienisch", "wloski",
+        "italyanca", "italiaans", "итальянский"],
+    "japanese": [
+        "ja", "jpn", "nihongo", "japonais", "japones", "japanisch",
+        "giapponese", "japonski", "japonca", "japans", "日本語", "にほんご",
+        "японский"],
+    "polish": [
+        "pl", "pol", "polski", "polonais", "polaco", "polnisch", "polacco",
+        "lehce", "pools", "польский"],
+    "portuguese": [
+        "pt", "por", "portugues", "portugais", "portugiesisch", "portoghese",
+        "portugalski", "portekizce", "portugees", "португальский"],
+    "romanian": [
+        "ro", "rum", "ron", "romana", "roumain", "rumano", "rumanisch",
+        "rumeno", "rumunski", "romence", "roemeens", "moldovan", "румынский"],
+    "russian": [
+        "ru", "rus", "russkij", "russe", "ruso", "russisch", "russo",
+        "rosyjski", "rusca", "русский"],
+    "spanish": [
+        "es", "spa", "espanol", "castellano", "espagnol", "spanisch",
+        "spagnolo", "hiszpanski", "ispanyolca", "spaans", "испанский"],
+    "turkish": [
+        "tr", "tur", "turkce", "turc", "turco", "turkisch", "turecki", "turks",
+        "турецкий"],
+}
+
+# Prefix patterns for abbreviations and misspellings, matched against
+# the asciified input.
+PATTERNS = [(re.compile(p), l) for p, l in [
+    (r"^ara\w*", "arabic"),
+    (r"^ch?i\w*", "chinese"),
+    (r"^(?:dut|ni?e(?:d|e)?|h?ola?|flem?)\w*", "dutch"),
+    (r"^(?:e|a|i)ng\w*", "english"),
+    (r"^fr\w*", "french"),
+    (r"^(?:al(?:l?e?m?)|dui|ted|nie|ger)\w*", "german"),
+    (r"^h?(?:i|e)br?\w*", "hebrew"),
+    (r"^(?:ita|wos)\w*", "italian"),
+    (r"^(?:j|gi)ap\w*", "japanese"),
+    (r"^(?:po+l|l(?:us|eh))\w*", "polish"),
+    (r"^por\w*", "portuguese"),
+    (r"^r(?:o|u)(?:m|e|u)\w*", "romanian"),
+    (r"^r(?:u|o)s\w*", "russian"),
+    (r"^(?:hi|e|i)?sz?p\w*", "spanish"),
+    (r"^tur\w*", "turkish")]]
+
+
+def asciify(text) -> str:
+    """Remove accent marks and any other non-ASCII characters from input"""
+    text = unicodedata.normalize("NFD", text)
+    asciified_text = text.encode("ascii", "ignore").decode("utf-8")
+    return asciified_text.lower()
+
+
+def normalize(text) -> str:
+    """Remove accent marks from input but keep other scripts intact"""
+    text = unicodedata.normalize("NFD", text.strip().lower())
+    return "".join(c for c in text if unicodedata.category(c) != "Mn")
+
+
+def build_indexes() -> tuple:
+    """Maps every known name, code and alias to its language, and every
+    prefix of at least three characters of those to the set of languages
+    it could stand for."""
+    index, prefixes = {}, {}
+    for language, aliases in ALIASES.items():
+        for alias in [language, *aliases]:
+            for key in {normalize(alias), asciify(alias)}:
+                if not key:
+                    continue
+                index.setdefault(key, language)
+                for i in range(3, len(key)):
+                    prefixes.setdefault(key[:i], set()).add(language)
+    return index, prefixes
+
+
+INDEX, PREFIXES = build_indexes()
+
+
+@functools.lru_cache(maxsize=1024)
+def resolve(language) -> str:
+    """Gets the lowercase English name of language, which may be given
+    in English or in the language itself, in any case, with or without
+    accent marks, as an ISO 639 code or as a recognizable abbreviation.
+    Raises LanguageError if it is unknown or matches several languages."""
+    if not language or not language.strip():
+        raise LanguageError("no language given")
+    for key in (normalize(language), asciify(language).strip()):
+        if key in INDEX:
+            return INDEX[key]
+    for key in (normalize(language), asciify(language).strip()):
+        matches = sorted(PREFIXES.get(key, ()))
+        if matches:
+            break
+    else:
+        matches = []
+        for pattern, name in PATTERNS:
+            if name not in matches and pattern.match(key):
+                matches.append(name)
+    if not matches:
+        raise LanguageError(f"unknown language: {language}")
+    if len(matches) > 1:
+        raise LanguageError(
+            f"ambiguous language: {language} (could be {' or '.join(matches)})")
+    return matches[0]
+
+
 class Languages:
     def __init__(self, language):
+        self.name = language
         self.language = self.asciify(language)
 
     def get_language(self) -> str:
         """Gets lowercase English version of language"""
-        if self.language in LANGUAGES:
-            return self.language
-        else:
-            patterns = [
-                (r"(^ara\w*)", "arabic"),
-                (r"(^ch?i\w*)", "chinese"),
-                (r"(^(?:dut|ni?e(?:d|e)?|h?ola?|flem?)\w*)", "dutch"),
-                (r"(^(?:e|a|i)ng\w*)", "english"),
-                (r"(^fr\w*)", "french"),
-                (r"(^(?:al(?:l?e?m?)|dui|ted|nie|ger)\w*)", "german"),
-                (r"(^h?(?:i|e)br?\w*)", "hebrew"),
-                (r"(^(?:ita|wos)\w*)", "italian"),
-                (r"(^(?:j|gi)ap\w*)", "japanese"),
-                (r"(^(?:po+l|l(?:us|eh))\w*)", "polish"),
-                (r"(^por\w*)", "portuguese"),
-                (r"(^r(?:o|u)(?:m|e|u)\w*)", "romanian"),
-                (r"(^r(?:u|o)s\w*)", "russian"),
-                (r"(^(?:hi|e|i)?sz?p\w*)", "spanish"),
-                (r"(^tur\w*)", "turkish"), ]
-            for p, l in patterns:
-                match = re.search(p, self.language)
-                if match:
-                    return l
+        return resolve(self.name)
 
     def deepl_get_abbrv(self, language) -> str:
         """Gets language abbreviation for DeepL"""
@@ -51,6 +169,4 @@ class Languages:
     @staticmethod
     def asciify(text) -> str:
         """Remove accent marks from input"""
-        text = unicodedata.normalize("NFD", text)
-        asciified_text = text.encode("ascii", "ignore").decode("utf-8")
-        return asciified_text.lower()
+        return asciify(text)
@@ -0,0 +1,231 @@
+import collections
+import csv
+import difflib
+import heapq
+import math
+import re
+import threading
+import xml.etree.ElementTree as ET
+
+from .languages import LanguageError, resolve
+
+# The attribute holding a TMX variant's language.
+XML_LANG = "{http://www.w3.org/XML/1998/namespace}lang"
+
+# TMX elements holding inline formatting codes rather than text.
+INLINE_CODES = {"bpt", "ept", "it", "ph", "ut"}
+
+Match = collections.namedtuple("Match", ["text", "translation", "score"])
+
+
+def normalize(text) -> str:
+    """Collapses runs of whitespace so spacing doesn't defeat lookups."""
+    return " ".join(text.split())
+
+
+def segment_text(element) -> str:
+    """The text of a TMX <seg>, leaving out inline formatting codes."""
+    parts = [element.text or ""]
+    for child in element:
+        if child.tag not in INLINE_CODES:
+            parts.append(segment_text(child))
+        parts.append(child.tail or "")
+    return "".join(parts)
+
+
+def trigrams(text) -> set:
+    """The character trigrams of text, ignoring case and padded so short
+    words still have some."""
+    text = f"  {normalize(text).casefold()} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class PairMemory:
+    """The segments of a single language pair, indexed by normalized text
+    for exact lookups and by trigram for fuzzy ones. Segments are only
+    ever appended, and a segment is in entries and sizes before its index
+    can be found in exact or grams. Lookups can therefore run while
+    another thread adds."""
+
+    def __init__(self):
+        self.entries = []
+        self.sizes = []
+        self.exact = {}
+        self.grams = collections.defaultdict(list)
+
+    def add(self, text, translation) -> None:
+        key = normalize(text)
+        if key in self.exact:
+            index = self.exact[key]
+            self.entries[index] = (text, translation)
+            return
+        index = len(self.entries)
+        grams = trigrams(text)
+        self.entries.append((text, translation))
+        self.sizes.append(len(grams))
+        self.exact[key] = index
+        for gram in grams:
+            self.grams[gram].append(index)
+        return
+
+    def lookup(self, text, threshold, candidates=5):
+        """Finds the segment most similar to text. The segments sharing
+        the most trigrams with text are compared with difflib, and the
+        best one is returned if its similarity reaches threshold."""
+        index = self.exact.get(normalize(text))
+        if index is not None:
+            return Match(*self.entries[index], 1.0)
+        if threshold >= 1:
+            return None
+        grams = trigrams(text)
+        # Each edit changes up to three trigrams, so a segment this similar
+        # to text has a trigram Dice coefficient of at least about dice,
+        # and so shares at least overlap trigrams with it. It must then
+        # contain some of the len(grams) - overlap + 1 rarest ones, so only
+        # their segments are counted, and ranked by how many they share.
+        dice = max(0.0, 3 * threshold - 2)
+        overlap = max(1, math.ceil(dice * len(grams) / (2 - dice)))
+        rare = sorted(grams, key=lambda gram: len(self.grams.get(gram, ())))
+        shared = collections.Counter()
+        for gram in rare[:len(grams) - overlap + 1]:
+            shared.update(self.grams.get(gram, ()))
+        low, high = overlap, len(grams) * (2 - dice) / max(dice, 1e-9)
+        ranked = heapq.nlargest(candidates, (
+            index for index in shared if low <= self.sizes[index] <= high),
+            key=shared.get)
+        best = None
+        query = normalize(text).casefold()
+        for index in ranked:
+            source, translation = self.entries[index]
+            score = difflib.SequenceMatcher(
+                None, query, normalize(source).casefold()).ratio()
+            if score >= threshold and (best is None or score > best.score):
+                best = Match(source, translation, score)
+        return best
+
+
+class TranslationMemory:
+    """Past source→target segment pairs for every language pair. Lookups
+    return an exact match or, failing that, the most similar segment whose
+    similarity (0 to 1) reaches threshold. A threshold of 1 only allows
+    exact matches. Besides imported segments, up to learn translations
+    fetched from providers are remembered; 0 turns that off."""
+
+    def __init__(self, threshold=0.9, learn=10000):
+        self.threshold = threshold
+        self.learn_limit = learn
+        self.learned = 0
+        self.pairs = collections.defaultdict(PairMemory)
+        self.hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return sum(len(pair.entries) for pair in list(self.pairs.values()))
+
+    def __getstate__(self):
+        # Locks can't be pickled, e.g. to send the memory to a worker
+        # process.
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        return
+
+    def add(self, source, target, text, translation) -> None:
+        """Remembers translation as the translation of text."""
+        if not text or not translation:
+            return
+        pair = (resolve(source), resolve(target))
+        with self._lock:
+            self.pairs[pair].add(text, translation)
+        return
+
+    def learn(self, source, target, text, translation) -> None:
+        """Remembers a translation fetched from a provider, unless learn
+        of them already have been."""
+        with self._lock:
+            if self.learned >= self.learn_limit:
+                return
+            self.learned += 1
+        self.add(source, target, text, translation)
+        return
+
+    def lookup(self, source, target, text, threshold=None):
+        """Gets the best Match for text, or None. The search doesn't hold
+        the lock, so lookups from many threads run side by side."""
+        pair = (resolve(source), resolve(target))
+        threshold = self.threshold if threshold is None else threshold
+        memory = self.pairs.get(pair)
+        match = None
+        if memory is not None:
+            match = memory.lookup(text, threshold)
+        with self._lock:
+            if match is None:
+                self.misses += 1
+            elif match.score < 1:
+                self.fuzzy_hits += 1
+            else:
+                self.hits += 1
+        return match
+
+    def stats(self) -> dict:
+        return {"segments": len(self), "hits": self.hits,
+                "fuzzy_hits": self.fuzzy_hits, "misses": self.misses}
+
+    def import_csv(self, f, source, target, source_field="source",
+                   target_field="target") -> int:
+        """Imports segment pairs from a CSV file with a header naming its
+        columns. Returns the number of pairs imported."""
+        count = 0
+        for row in csv.DictReader(f):
+            text, translation = row.get(source_field), row.get(target_field)
+            if text and translation:
+                self.add(source, target, text, translation)
+                count += 1
+        return count
+
+    def import_tmx(self, f, source=None, target=None) -> int:
+        """Imports segment pairs from a TMX file. Every translation unit
+        adds a pair for each two of its languages that pystone knows, or
+        only for source and target if given. Returns the number of pairs
+        imported."""
+        only = (resolve(source), resolve(target)) if source and target else None
+        count = 0
+        for _, element in ET.iterparse(f):
+            if element.tag != "tu":
+                continue
+            segments = {}
+            for tuv in element.iter("tuv"):
+                seg = tuv.find("seg")
+                language = tuv.get(XML_LANG) or tuv.get("lang")
+                if seg is None or not language:
+                    continue
+                try:
+                    language = resolve(re.split(r"[-_]", language)[0])
+                except LanguageError:
+                    continue
+                segments[language] = normalize(segment_text(seg))
+            for a, text in segments.items():
+                for b, translation in segments.items():
+                    if a == b or (only and (a, b) != only):
+                        continue
+                    self.add(a, b, text, translation)
+                    count += 1
+            element.clear()
+        return count
+
+    def load(self, path, source=None, target=None) -> int:
+        """Imports a .tmx file, or a CSV file with "source" and "target"
+        columns for the source and target languages."""
+        if path.lower().endswith(".tmx"):
+            with open(path, "rb") as f:
+                return self.import_tmx(f, source, target)
+        if not source or not target:
+            raise ValueError("importing CSV requires a source and target language")
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            return self.import_csv(f, source, target)
@@ -0,0 +1,143 @@
+import contextlib
+import threading
+import time
+
+# Upper bounds, in seconds, of the latency histogram buckets.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Counts observations into cumulative buckets like a Prometheus
+    histogram."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value) -> None:
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        return
+
+    def cumulative(self) -> list:
+        """Gets the number of observations at or below each bucket."""
+        total, cumulative = 0, []
+        for count in self.counts:
+            total += count
+            cumulative.append(total)
+        return cumulative
+
+    def quantile(self, q) -> float:
+        """Estimates the q-quantile by interpolating within its bucket."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        lower, seen = 0.0, 0
+        for bound, count in zip(self.buckets, self.counts):
+            if count and seen + count >= rank:
+                return lower + (bound - lower) * (rank - seen) / count
+            seen += count
+            lower = bound
+        return self.buckets[-1]
+
+
+class Metrics:
+    """A registry of labelled counters and latency histograms. Hooks
+    registered with add_hook are called with (name, value, labels) for
+    every observation and increment."""
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.hooks = []
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook) -> None:
+        self.hooks.append(hook)
+        return
+
+    def remove_hook(self, hook) -> None:
+        self.hooks.remove(hook)
+        return
+
+    def increment(self, name, amount=1, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+        self._notify(name, amount, labels)
+        return
+
+    def observe(self, name, value, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].observe(value)
+        self._notify(name, value, labels)
+        return
+
+    @contextlib.contextmanager
+    def timer(self, name, **labels):
+        """Observes how long the body of the with statement takes."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def _notify(self, name, value, labels) -> None:
+        for hook in list(self.hooks):
+            hook(name, value, labels)
+        return
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+        return
+
+    def to_prometheus(self) -> str:
+        """Renders every metric in the Prometheus text exposition format."""
+        lines, typed = [], set()
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items(), key=lambda i: i[0])
+            snapshot = [(key, h.buckets, h.cumulative(), h.sum, h.count)
+                        for key, h in histograms]
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{format_labels(labels)} {value}")
+        for (name, labels), buckets, cumulative, total, count in snapshot:
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            for bound, value in zip(buckets, cumulative):
+                le = format_labels(labels + (("le", repr(float(bound))),))
+                lines.append(f"{name}_bucket{le} {value}")
+            le = format_labels(labels + (("le", "+Inf"),))
+            lines.append(f"{name}_bucket{le} {count}")
+            lines.append(f"{name}_sum{format_labels(labels)} {total}")
+            lines.append(f"{name}_count{format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def format_labels(labels) -> str:
+    """Formats (name, value) pairs as a Prometheus label set."""
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+               for _, v in labels)
+    pairs = ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped))
+    return "{" + pairs + "}"
+
+
+# The process-wide registry every provider records into.
+metrics = Metrics()
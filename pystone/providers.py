@@ -0,0 +1,261 @@
+import contextlib
+import gzip
+import importlib
+import threading
+import time
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from urllib3.util import make_headers
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+from .constants import LANGUAGES
+from .languages import LanguageError, resolve
+from .metrics import metrics
+from .session import get_session
+
+PROVIDERS = {}
+
+# The response encodings urllib3 can decode. "br" is only included when a
+# brotli package is installed (pip install pystone[brotli]), so servers
+# are never asked for a body that can't be read.
+ACCEPT_ENCODING = make_headers(accept_encoding=True)["accept-encoding"]
+
+# Modules holding the built-in providers, imported on first lookup.
+BUILTIN_PROVIDERS = {
+    "reverso": ".reverso",
+    "deepl": ".deepl",
+}
+
+
+class ProviderError(Exception):
+    """Raised when every provider a request was routed to failed."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        details = "; ".join(f"{name}: {e}" for name, e in errors)
+        super().__init__(f"all providers failed ({details})")
+
+
+def register(cls):
+    """Class decorator that adds a provider to the registry."""
+    PROVIDERS[cls.name] = cls
+    return cls
+
+
+class StreamedBody:
+    """A request body sent with chunked transfer encoding whose chunks
+    are made by calling fn each time it is iterated. The Session retries
+    failed requests with the same body, so a plain generator would be
+    used up and the retry sent empty."""
+
+    def __init__(self, fn, *args):
+        self.fn = fn
+        self.args = args
+
+    def __iter__(self):
+        return iter(self.fn(*self.args))
+
+
+def gzip_body(data):
+    """Gzips a request body. Streamed bodies are compressed chunk by
+    chunk as they are sent, and must be re-iterable like StreamedBody."""
+    if isinstance(data, str):
+        data = data.encode()
+    if isinstance(data, bytes):
+        return gzip.compress(data)
+    return StreamedBody(gzip_chunks, data)
+
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def get_provider(name):
+    """Gets the provider class registered under name."""
+    if name not in PROVIDERS and name in BUILTIN_PROVIDERS:
+        importlib.import_module(BUILTIN_PROVIDERS[name], __package__)
+    try:
+        return PROVIDERS[name]
+    except KeyError:
+        raise ValueError(f"unknown provider: {name}") from None
+
+
+class Provider:
+    """The interface every translation backend implements. A provider is
+    created for a single text and translated with translate(), which
+    returns a dict with at least "translation", "examples" and
+    "alternatives" keys. name is both the registry key and the key of
+    the provider's language codes in constants.LANGUAGES."""
+    name = None
+    headers = {}
+    timeout = None
+    # Whether to gzip request bodies. Only turn this on for endpoints that
+    # accept "content-encoding: gzip".
+    compress = False
+
+    def __init__(self, text, source, target, s=None):
+        self.text = text
+        self.source = source
+        self.target = target
+        self.s = s
+
+    def translate(self) -> dict:
+        raise NotImplementedError
+
+    def create_session(self) -> requests.sessions.Session:
+        """Returns the process-wide pooled Session object."""
+        return get_session()
+
+    def set_languages(self) -> None:
+        """Sets appropriate language abbreviations for use for the API."""
+        for language in (self.source, self.target):
+            if not LANGUAGES[resolve(language)][self.name]:
+                raise LanguageError(
+                    f"{resolve(language).capitalize()} is not supported by {self.name}")
+        self.source = LANGUAGES[resolve(self.source)][self.name]
+        self.target = LANGUAGES[resolve(self.target)][self.name]
+        return
+
+    def labels(self) -> dict:
+        """Labels identifying this provider and language pair in metrics."""
+        return {"provider": self.name, "pair": f"{self.source}-{self.target}"}
+
+    def timer(self, phase):
+        """Times a phase of the translation, such as parsing."""
+        return metrics.timer("pystone_phase_seconds", phase=phase, **self.labels())
+
+    @contextlib.contextmanager
+    def request(self, method, url, **kwargs):
+        """Sends a request through the Session and yields the Response,
+        recording the round trip ("send") and server ("server") time, the
+        response status, retries made by the Session and any error. Only
+        decodable response encodings are accepted, and the body is gzipped
+        if compress is set."""
+        labels = self.labels()
+        kwargs["headers"] = {"accept-encoding": ACCEPT_ENCODING,
+                             **kwargs.get("headers", {})}
+        if self.compress and kwargs.get("data") is not None:
+            kwargs["data"] = gzip_body(kwargs["data"])
+            kwargs["headers"]["content-encoding"] = "gzip"
+        start = time.perf_counter()
+        try:
+            with self.s.request(method, url, timeout=self.timeout, **kwargs) as r:
+                metrics.observe("pystone_phase_seconds", r.elapsed.total_seconds(),
+                                phase="server", **labels)
+                metrics.increment("pystone_requests_total",
+                                  status=str(r.status_code), **labels)
+                retries = getattr(getattr(r.raw, "retries", None), "history", ())
+                if retries:
+                    metrics.increment("pystone_retries_total", len(retries),
+                                      reason="status", **labels)
+                yield r
+        except Exception as e:
+            metrics.increment("pystone_errors_total",
+                              type=type(e).__name__, **labels)
+            raise
+        finally:
+            metrics.observe("pystone_phase_seconds", time.perf_counter() - start,
+                            phase="send", **labels)
+
+    def read_json(self, r):
+        """Decodes a JSON response sent with stream=True. With ijson
+        installed (pip install pystone[streaming]), the body is parsed as
+        it downloads and is decompressed, without ever holding all of it
+        in memory. Otherwise it is read whole."""
+        if ijson is None:
+            return r.json()
+        r.raw.decode_content = True
+        return next(ijson.items(r.raw, "", use_float=True))
+
+
+class Router:
+    """Sends a translation to providers in order of preference. If one
+    fails, the next is tried. If hedge_after is set and a provider hasn't
+    answered within that many seconds, the next one is started as well
+    and whichever succeeds first wins. With a timeout, requests go
+    through a Session that doesn't retry timeouts, so a provider that
+    doesn't answer fails over after timeout seconds."""
+
+    def __init__(self, providers=("reverso", "deepl"), timeout=None,
+                 hedge_after=None, s=None):
+        self.providers = [get_provider(name) for name in providers]
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.s = s
+
+    def call(self, cls, text, source, target) -> dict:
+        """Translates text with a single provider."""
+        s = self.s or get_session(retry_timeouts=self.timeout is None)
+        provider = cls(text, source, target, s=s)
+        provider.timeout = self.timeout
+        result = provider.translate()
+        result["provider"] = cls.name
+        return result
+
+    def translate(self, text, source, target) -> dict:
+        """Translates text with the first provider that succeeds. The
+        result has an extra "provider" key naming it. Without hedging, the
+        providers are tried one after another on the caller's thread."""
+        if self.hedge_after is not None:
+            return self.hedge(text, source, target)
+        errors = []
+        for cls in self.providers:
+            try:
+                return self.call(cls, text, source, target)
+            except Exception as e:
+                errors.append((cls.name, e))
+        raise ProviderError(errors)
+
+    def hedge(self, text, source, target) -> dict:
+        """Translates text with hedging. Each call gets a pool with a
+        thread per provider, so requests never queue behind other callers,
+        and the wait before the next provider starts once the previous
+        request has."""
+        pool = ThreadPoolExecutor(max_workers=len(self.providers))
+        providers = iter(self.providers)
+        pending, errors = {}, []
+
+        def start():
+            cls = next(providers, None)
+            if cls is not None:
+                started = threading.Event()
+
+                def call():
+                    started.set()
+                    return self.call(cls, text, source, target)
+
+                pending[pool.submit(call)] = cls.name
+                started.wait()
+            return cls is not None
+
+        try:
+            start()
+            can_hedge = True
+            while pending:
+                timeout = self.hedge_after if can_hedge else None
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    can_hedge = start()
+                    continue
+                for future in done:
+                    name = pending.pop(future)
+                    try:
+                        return future.result()
+                    except Exception as e:
+                        errors.append((name, e))
+                if not pending:
+                    start()
+            raise ProviderError(errors)
+        finally:
+            pool.shutdown(wait=False)
@@ -0,0 +1,102 @@
+from collections.abc import Mapping
+
+# Marks a field that hasn't been built yet.
+_UNSET = object()
+
+
+class TranslationResult(Mapping):
+    """A parsed Reverso response. Only the parts of the response its fields
+    are built from are kept: the input and translation segments, the first
+    context result's examples and the other context results' translations.
+    The text fields are joined the first time they are read, so a result
+    whose translation is all that's ever used, or that just sits in a
+    cache, stays small. It reads like the dict
+    parse_reverso_translation_response used to return, with "examples"
+    naming the target examples. Other keys, such as the router's
+    "provider", can be set on it too."""
+    __slots__ = ("_segments", "_translations", "_input", "_translation",
+                 "_source_examples", "_target_examples", "_alternatives",
+                 "_extra")
+
+    # The keys of the result, and the slots caching them.
+    FIELDS = {
+        "input": "_input",
+        "translation": "_translation",
+        "source_examples": "_source_examples",
+        "target_examples": "_target_examples",
+        "examples": "_target_examples",
+        "alternatives": "_alternatives",
+    }
+
+    def __init__(self, raw):
+        context_results = raw["contextResults"]
+        results = context_results["results"] if context_results else None
+        # The input and translation segments, joined on first read.
+        self._segments = (raw["input"], raw["translation"])
+        # The translation of every context result.
+        self._translations = ([result["translation"] for result in results]
+                              if results else None)
+        self._input = _UNSET
+        self._translation = _UNSET
+        self._source_examples = results[0]["sourceExamples"] if results else None
+        self._target_examples = results[0]["targetExamples"] if results else None
+        self._alternatives = _UNSET
+        self._extra = None
+
+    def __getitem__(self, key):
+        slot = self.FIELDS.get(key)
+        if slot is None:
+            if self._extra is None:
+                raise KeyError(key)
+            return self._extra[key]
+        value = getattr(self, slot)
+        if value is _UNSET:
+            value = getattr(self, f"build{slot}")()
+            setattr(self, slot, value)
+        return value
+
+    def __setitem__(self, key, value) -> None:
+        slot = self.FIELDS.get(key)
+        if slot is not None:
+            setattr(self, slot, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+        return
+
+    def __iter__(self):
+        yield from self.FIELDS
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self):
+        return len(self.FIELDS) + len(self._extra or ())
+
+    def __repr__(self):
+        return f"TranslationResult({dict(self)!r})"
+
+    @property
+    def translation(self) -> str:
+        return self["translation"]
+
+    @property
+    def examples(self) -> list:
+        return self["examples"]
+
+    @property
+    def alternatives(self) -> list:
+        return self["alternatives"]
+
+    def build_input(self) -> str:
+        return " ".join(self._segments[0])
+
+    def build_translation(self) -> str:
+        if self._translations and len(self._translations) > 1:
+            return self._translations[0]
+        return " ".join(self._segments[1])
+
+    def build_alternatives(self) -> list:
+        if self._translations and len(self._translations) > 1:
+            return self._translations[1:]
+        return None
@@ -1,58 +1,55 @@
 import base64
 import json
 
-import requests
+from .constants import LANGUAGES
+from .languages import resolve
+from .providers import Provider, register
+from .result import TranslationResult
 
-from .languages import Languages
 
-
-class Reverso:
+@register
+class Reverso(Provider):
+    name = "reverso"
     api = "https://api.reverso.net/translate/v1/translation"
     voice_url = "https://voice.reverso.net/RestPronunciation.svc/v1/output=json/GetVoiceStream/voiceName={}?inputText={}"
+    headers = {
+        "content-type": "application/json; charset=utf-8",
+        "host": "api.reverso.net",
+        "origin": "https://www.reverso.net",
+        "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/89.0.4371.0 Safari/537.36"
+    }
+    audio_headers = {
+        "accept": "audio/webm,audio/ogg,audio/wav,audio/*;q=0.9,application/ogg;q=0.7,video/*;q=0.6,*/*;q=0.5",
+        "host": "voice.reverso.net"
+    }
+    # The voice reading audio, or None for the target language's voice.
+    voice = None
 
-    def __init__(self, text, source, target, s=None):
-        self.text = text
-        self.source = source
-        self.target = target
-        self.s = s
+    def __init__(self, text, source, target, s=None, voice=None):
+        super().__init__(text, source, target, s=s)
+        if voice is not None:
+            self.voice = voice
 
-    def reverso(self) -> dict:
-        """The central method to the Reverso class that establishes a common
+    def reverso(self) -> TranslationResult:
+        """The central method to the Reverso class that reuses the pooled
         Session object, sets the language abbreviations for the Reverso API,
         retrieves a response from the Reverso API endpoint, parses the
         response from the Reverso API endpoint, and then returns the parsed
         response."""
-        self.s = self.create_session()
+        self.s = self.s or self.create_session()
         self.set_languages()
         response = self.get_reverso_translation_response()
-        parsed_response = self.parse_reverso_translation_response(response)
+        with self.timer("parse"):
+            parsed_response = self.parse_reverso_translation_response(response)
         return parsed_response
 
-    def create_session(self) -> requests.sessions.Session:
-        """Creates a Session object."""
-        headers = {
-            "accept-encoding": "gzip, deflate, br",
-            "content-type": "application/json; charset=utf-8",
-            "host": "api.reverso.net",
-            "origin": "https://www.reverso.net",
-            "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/89.0.4371.0 Safari/537.36"
-        }
-        s = requests.Session()
-        s.headers.update(headers)
-        return s
-
-    def set_languages(self) -> None:
-        """Sets appropriate language abbreviations for use for the Reverso API."""
-        source = Languages(self.source)
-        source_language = source.get_language()
-        self.source = source.reverso_get_abbrv(source_language)
-        target = Languages(self.target)
-        target_language = target.get_language()
-        self.target = target.reverso_get_abbrv(target_language)
-        return
+    def translate(self) -> TranslationResult:
+        """Translates the text. The result names the target examples
+        "examples" like every other provider."""
+        return self.reverso()
 
-    def get_reverso_translation_response(self) -> dict:
-        """Sends source text to the Reverso API endpoint."""
+    def get_reverso_translation_payload(self) -> str:
+        """Builds the JSON body sent to the Reverso API endpoint."""
         payload = {
             "input": self.text,
             "from": self.source,
@@ -65,57 +62,42 @@ class Reverso:
                 "languageDetection": False
             }
         }
-        payload = json.dumps(payload)
-        with self.s.post(self.api, data=payload) as r:
+        return json.dumps(payload)
+
+    def get_reverso_translation_response(self) -> dict:
+        """Sends source text to the Reverso API endpoint."""
+        payload = self.get_reverso_translation_payload()
+        with self.request("POST", self.api, data=payload,
+                          headers=self.headers, stream=True) as r:
             if r.ok:
-                return r.json()
+                return self.read_json(r)
             else:
                 r.raise_for_status()
 
-    def parse_reverso_translation_response(self, response) -> dict:
-        """Parses the response from the Reverso API endpoint."""
-        input_ = response["input"]
-        context_results = response["contextResults"]
-        if context_results:
-            results = context_results["results"]
-            if len(results) == 1:
-                translation = response["translation"]
-                alternatives = None
-            else:
-                translations = [result["translation"] for result in results]
-                translation = [translations.pop(0)]
-                alternatives = translations
-            source_examples = results[0]["sourceExamples"]
-            target_examples = results[0]["targetExamples"]
-        else:
-            translation = response["translation"]
-            source_examples, target_examples, alternatives = None, None, None
-        input_text = " ".join(input_)
-        translation_text = " ".join(translation)
-        info = {
-            "input": input_text,
-            "translation": translation_text,
-            "source_examples": source_examples,
-            "target_examples": target_examples,
-            "alternatives": alternatives
-        }
-        return info
+    def parse_reverso_translation_response(self, response) -> TranslationResult:
+        """Parses the response from the Reverso API endpoint, keeping only
+        the parts the result's fields are built from."""
+        return TranslationResult(response)
 
     def audio(self):
-        self.s = self.create_session()
-        self.update_session_audio()
+        self.s = self.s or self.create_session()
         voice_name = self.get_reverso_voice()
         input_text = self.base64_translation()
         content = self.get_reverso_translation_audio(voice_name, input_text)
         return content
 
-    def update_session_audio(self) -> None:
-        audio_headers = {
-            "accept": "audio/webm,audio/ogg,audio/wav,audio/*;q=0.9,application/ogg;q=0.7,video/*;q=0.6,*/*;q=0.5",
-            "host": "voice.reverso.net"
-        }
-        self.s.headers.update(audio_headers)
-        return
+    def stream_audio(self, chunk_size=8192):
+        """Like audio but yields the MP3 in chunks as they arrive."""
+        self.s = self.s or self.create_session()
+        voice_name = self.get_reverso_voice()
+        input_text = self.base64_translation()
+        yield from self.stream_reverso_translation_audio(
+            voice_name, input_text, chunk_size)
+
+    def get_audio_headers(self) -> dict:
+        """Headers for the voice endpoint. These are sent per request
+        rather than set on the Session since the Session is shared."""
+        return {**self.headers, **self.audio_headers}
 
     def base64_translation(self) -> str:
         encoded_text = self.text.encode()
@@ -124,14 +106,21 @@ class Reverso:
         return b64_decoded_translation
 
     def get_reverso_voice(self) -> str:
-        target = Languages(self.target)
-        target_language = target.get_language()
-        voice_name = target.reverso_get_voice_name(target_language)
+        if self.voice is not None:
+            return self.voice
+        voice_name = LANGUAGES[resolve(self.target)]["reverso_voice"]
         return voice_name
 
     def get_reverso_translation_audio(self, voice, text) -> bytes:
-        with self.s.get(self.voice_url.format(voice, text)) as r:
+        with self.request("GET", self.voice_url.format(voice, text),
+                          headers=self.get_audio_headers()) as r:
             if r.ok:
                 return r.content
             else:
                 r.raise_for_status()
+
+    def stream_reverso_translation_audio(self, voice, text, chunk_size=8192):
+        with self.request("GET", self.voice_url.format(voice, text),
+                          headers=self.get_audio_headers(), stream=True) as r:
+            r.raise_for_status()
+            yield from r.iter_content(chunk_size=chunk_size)
@@ -0,0 +1,273 @@
+import http.client
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .constants import SERVER_ADDRESS
+from .languages import LanguageError
+from .metrics import metrics
+
+# Endpoints taking {"text", "source", "target"} and the Engine methods
+# answering them.
+ENDPOINTS = {
+    "/translate": "translate",
+    "/deepl": "deepl",
+    "/alternatives": "alternatives",
+    "/audio": "audio",
+}
+
+
+class ServerError(Exception):
+    """Raised by Client when the daemon answers with an error."""
+
+    def __init__(self, status, message):
+        self.status = status
+        super().__init__(f"{status}: {message}")
+
+
+def is_unix_address(address) -> bool:
+    """Addresses containing a path separator are Unix socket paths."""
+    return os.sep in address or address.startswith("unix:")
+
+
+def parse_address(address) -> tuple:
+    """Splits "HOST:PORT" into a (host, port) pair."""
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def unix_path(address) -> str:
+    return address[len("unix:"):] if address.startswith("unix:") else address
+
+
+class Engine:
+    """Answers daemon requests with one set of warm pooled sessions,
+    caches and router shared by every client. Translate coalesces
+    concurrent identical requests into one upstream call."""
+
+    def __init__(self, cache=None, router=None, audio_cache=None, memory=None):
+        from .audio import AudioCache
+        from .session import get_session
+        self.cache = cache
+        self.router = router
+        self.memory = memory
+        self.audio_cache = audio_cache or AudioCache()
+        self.s = get_session()
+
+    def _translate(self, text, source, target):
+        from .translate import Translate
+        return Translate(text, source, target, s=self.s, cache=self.cache,
+                         audio_cache=self.audio_cache, router=self.router,
+                         memory=self.memory)
+
+    def translate(self, text, source, target) -> dict:
+        translate = self._translate(text, source, target)
+        translate.translate()
+        return translate.to_dict()
+
+    def deepl(self, text, source, target) -> dict:
+        translate = self._translate(text, source, target)
+        translate.deepl()
+        return {**translate.to_dict(), "alternatives": None}
+
+    def alternatives(self, text, source, target) -> dict:
+        return {"alternatives": self.translate(text, source, target)["alternatives"]}
+
+    def audio(self, text, source, target) -> bytes:
+        path = self._translate(None, source, target).audio_file(text)
+        with open(path, "rb") as f:
+            return f.read()
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "pystone"
+
+    def log_message(self, format, *args):
+        return
+
+    def do_GET(self):
+        if self.path == "/health":
+            return self.send_json(200, {"status": "ok"})
+        if self.path == "/metrics":
+            return self.send_body(200, metrics.to_prometheus().encode(),
+                                  "text/plain; version=0.0.4")
+        return self.send_json(404, {"error": f"unknown path: {self.path}"})
+
+    def do_POST(self):
+        method = ENDPOINTS.get(self.path)
+        if method is None:
+            return self.send_json(404, {"error": f"unknown path: {self.path}"})
+        try:
+            length = int(self.headers.get("content-length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            text = request["text"]
+            source = request.get("source") or "English"
+            target = request["target"]
+        except (ValueError, KeyError, TypeError) as e:
+            return self.send_json(400, {"error": f"bad request: {e}"})
+        try:
+            result = getattr(self.server.engine, method)(text, source, target)
+        except LanguageError as e:
+            return self.send_json(400, {"error": str(e)})
+        except Exception as e:
+            return self.send_json(502, {"error": f"{type(e).__name__}: {e}"})
+        if method == "audio":
+            return self.send_body(200, result, "audio/mpeg")
+        return self.send_json(200, result)
+
+    def send_json(self, status, data) -> None:
+        body = json.dumps(data, ensure_ascii=False).encode()
+        self.send_body(status, body, "application/json")
+
+    def send_body(self, status, body, content_type) -> None:
+        self.send_response(status)
+        self.send_header("content-type", content_type)
+        self.send_header("content-length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        # BaseHTTPRequestHandler expects a (host, port) client address.
+        request, _ = super().get_request()
+        return request, ("local", 0)
+
+
+class Server:
+    """Serves an Engine over HTTP on "HOST:PORT" or on a Unix socket
+    path, with a JSON protocol: POST {"text", "source", "target"} to
+    /translate, /deepl, /alternatives or /audio (which answers with MP3
+    bytes). GET /health and /metrics are also available."""
+
+    def __init__(self, address=SERVER_ADDRESS, engine=None):
+        self.address = address
+        self.engine = engine or Engine()
+        if is_unix_address(address):
+            path = unix_path(address)
+            if os.path.exists(path):
+                os.unlink(path)
+            self.httpd = UnixHTTPServer(path, Handler)
+        else:
+            self.httpd = HTTPServer(parse_address(address), Handler)
+        self.httpd.engine = self.engine
+
+    def serve_forever(self) -> None:
+        try:
+            self.httpd.serve_forever()
+        finally:
+            self.close()
+        return
+
+    def shutdown(self) -> None:
+        """Stops serve_forever from another thread."""
+        self.httpd.shutdown()
+        return
+
+    def close(self) -> None:
+        self.httpd.server_close()
+        if is_unix_address(self.address) and os.path.exists(unix_path(self.address)):
+            os.unlink(unix_path(self.address))
+        return
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+class Client:
+    """A thin client for a pystone daemon. It only needs the standard
+    library, so it starts quickly and leaves the network to the daemon.
+    Each thread gets its own keep-alive connection."""
+
+    def __init__(self, address=SERVER_ADDRESS, timeout=None):
+        self.address = address
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def connection(self) -> http.client.HTTPConnection:
+        """Gets this thread's connection, opening it if needed."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if is_unix_address(self.address):
+                conn = UnixHTTPConnection(unix_path(self.address), self.timeout)
+            else:
+                host, port = parse_address(self.address)
+                conn = http.client.HTTPConnection(host, port, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def request(self, path, text, source, target) -> bytes:
+        """Posts a request and returns the response body. If the daemon
+        closed an idle keep-alive connection, the request is sent once
+        more on a new one."""
+        body = json.dumps({"text": text, "source": source, "target": target})
+        for attempt in range(2):
+            reused = getattr(self._local, "conn", None) is not None
+            conn = self.connection()
+            try:
+                conn.request("POST", path, body=body.encode(),
+                             headers={"content-type": "application/json"})
+                r = conn.getresponse()
+                data = r.read()
+                break
+            except (http.client.HTTPException, OSError):
+                self.close()
+                if not reused or attempt:
+                    raise
+        if r.status != 200:
+            raise ServerError(r.status, json.loads(data).get("error"))
+        return data
+
+    def translate(self, text, source, target) -> dict:
+        return json.loads(self.request("/translate", text, source, target))
+
+    def deepl(self, text, source, target) -> dict:
+        return json.loads(self.request("/deepl", text, source, target))
+
+    def alternatives(self, text, source, target) -> list:
+        return json.loads(self.request("/alternatives", text, source, target))["alternatives"]
+
+    def audio(self, text, source, target) -> bytes:
+        return self.request("/audio", text, source, target)
+
+    def close(self) -> None:
+        """Closes this thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+        return
+
+
+def main(args, cache=None, router=None, memory=None) -> None:
+    """Runs the serve subcommand."""
+    server = Server(args.listen, Engine(cache=cache, router=router, memory=memory))
+    # Supervisors stop daemons with SIGTERM; exit cleanly so the Unix
+    # socket is removed.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print(f"Serving on {args.listen}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return
@@ -0,0 +1,122 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+from .metrics import metrics
+
+
+class TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        with metrics.timer("pystone_connect_seconds", host=self.host):
+            super().connect()
+
+
+class TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        with metrics.timer("pystone_connect_seconds", host=self.host):
+            super().connect()
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """An HTTPAdapter that records how long each new connection takes to
+    establish, including the TLS handshake."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool
+        }
+
+
+class SessionPool:
+    """Owns a single keep-alive Session whose connection pools are shared
+    by every Reverso and DeepL call made through it."""
+
+    def __init__(self, pool_connections=10, pool_maxsize=10, retries=3,
+                 backoff_factor=0.3, status_forcelist=(500, 502, 503, 504),
+                 retry_timeouts=True):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.retries = retries
+        self.retry_timeouts = retry_timeouts
+        self.backoff_factor = backoff_factor
+        self.status_forcelist = status_forcelist
+        self._session = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self) -> requests.sessions.Session:
+        """Lazily creates the pooled Session on first use."""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self.create_session()
+        return self._session
+
+    def create_session(self) -> requests.sessions.Session:
+        """Creates a Session object with pooled, retrying adapters. 429
+        responses are left to the Executor, which backs off per provider.
+        Without retry_timeouts, connect and read timeouts are not retried,
+        so a request's timeout bounds how long it takes."""
+        timeout_retries = None if self.retry_timeouts else 0
+        retry = Retry(
+            total=self.retries,
+            connect=timeout_retries,
+            read=timeout_retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=self.status_forcelist,
+            allowed_methods=frozenset(["GET", "POST"]),
+            respect_retry_after_header=False,
+            raise_on_status=False)
+        adapter = TimedHTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=retry)
+        s = requests.Session()
+        s.mount("https://", adapter)
+        s.mount("http://", adapter)
+        return s
+
+    def close(self) -> None:
+        """Closes the Session and every pooled connection it holds."""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+        return
+
+
+_default_pool = SessionPool()
+# Used by callers with their own deadline, such as a Router with a timeout.
+_deadline_pool = SessionPool(retry_timeouts=False)
+
+
+def configure(**kwargs) -> SessionPool:
+    """Replaces the process-wide pools with ones built from kwargs."""
+    global _default_pool, _deadline_pool
+    _default_pool.close()
+    _deadline_pool.close()
+    _default_pool = SessionPool(**kwargs)
+    _deadline_pool = SessionPool(**{**kwargs, "retry_timeouts": False})
+    return _default_pool
+
+
+def get_session(retry_timeouts=True) -> requests.sessions.Session:
+    """Returns the process-wide pooled Session, or without retry_timeouts,
+    the one that doesn't retry connect and read timeouts."""
+    if not retry_timeouts:
+        return _deadline_pool.session
+    return _default_pool.session
@@ -0,0 +1,203 @@
+import collections
+import json
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.managers import BaseManager
+
+from .batch import READERS, Batch, Checkpoint, close_streams, file_offsets, guess_format, open_streams
+from .executor import RATES, Executor, TokenBucket, share_buckets
+
+# Formats with one record per non-blank line. Their shards are raw lines,
+# which the workers parse; the other formats are parsed before sharding.
+LINE_FORMATS = {"text", "jsonl"}
+
+
+class RateCoordinator(BaseManager):
+    """A local process serving the token buckets that every worker
+    process draws from, so that together they stay under one rate
+    limit."""
+
+
+RateCoordinator.register("TokenBucket", TokenBucket)
+
+
+# The Batch translating shards in a worker process.
+_batch = None
+
+
+def init_worker(options, buckets, memory) -> None:
+    """Gives a worker process its own pooled session, caches and
+    threads. The shared token buckets become the process-wide ones, so
+    every request the worker makes draws from them."""
+    global _batch
+    from .cache import SQLiteCache, TranslationCache
+    from .session import configure
+    configure(pool_maxsize=options["pool_size"], retries=options["retries"])
+    share_buckets(buckets)
+    cache = None
+    if options["use_cache"]:
+        cache = TranslationCache(SQLiteCache(options["cache_path"]))
+    executor = Executor(max_workers=options["workers"])
+    _batch = Batch(options["source"], options["target"], fmt=options["fmt"],
+                   field=options["field"], provider=options["provider"],
+                   executor=executor, cache=cache, memory=memory)
+    return
+
+
+def translate_shard(shard) -> list:
+    """Parses and translates a shard in a worker process. Returns a
+    (failed, JSON) pair per record. The JSON leaves out the index the
+    Batch gives each result, which is only known once the shards are
+    merged."""
+    fmt, items = shard
+    records = READERS[fmt](items, _batch.field) if fmt in LINE_FORMATS else items
+    encoded = []
+    groups = _batch.executor.map(_batch.process, _batch.group(enumerate(records)))
+    for outcomes in groups:
+        for _, failed, result in outcomes:
+            del result["index"]
+            encoded.append((failed, json.dumps(result, ensure_ascii=False)))
+    return encoded
+
+
+class ShardedBatch:
+    """Translates very large inputs with a pool of worker processes, each
+    running a Batch with its own pooled session, caches and threads, so
+    parsing, encoding and normalization no longer share one interpreter.
+    The input is cut into shards of shard_size lines or records, and the
+    results are merged back in input order. Workers take their requests
+    from token buckets served by a RateCoordinator, so the provider's
+    rate limit holds across all of them. If a worker process dies, the
+    pool is restarted and the unfinished shards are sent again, up to
+    max_restarts times."""
+
+    def __init__(self, source, target, fmt="text", field="text",
+                 provider="reverso", processes=2, workers=4, shard_size=1000,
+                 rate=None, checkpoint=None, cache_path=None, use_cache=True,
+                 memory=None, pool_size=10, retries=3, max_restarts=3):
+        self.source = source
+        self.target = target
+        self.fmt = fmt
+        self.field = field
+        self.provider = provider
+        self.processes = processes
+        self.workers = workers
+        self.shard_size = shard_size
+        self.rate = rate or RATES[provider]
+        self.checkpoint = Checkpoint(checkpoint, every=1)
+        self.cache_path = cache_path
+        self.use_cache = use_cache
+        self.memory = memory
+        self.pool_size = pool_size
+        self.retries = retries
+        self.max_restarts = max_restarts
+
+    def options(self) -> dict:
+        """The settings each worker process builds its Batch from."""
+        return {
+            "source": self.source,
+            "target": self.target,
+            "fmt": self.fmt,
+            "field": self.field,
+            "provider": self.provider,
+            "workers": self.workers,
+            "cache_path": self.cache_path,
+            "use_cache": self.use_cache,
+            "pool_size": self.pool_size,
+            "retries": self.retries
+        }
+
+    def shards(self, f):
+        """Yields lists of up to shard_size records, or of the lines
+        holding them, skipping the records written before the last
+        checkpoint."""
+        if self.fmt in LINE_FORMATS:
+            items = (line for line in f if line.strip())
+        else:
+            items = READERS[self.fmt](f, self.field)
+        shard = []
+        for index, item in enumerate(items):
+            if index <= self.checkpoint.index:
+                continue
+            shard.append(item)
+            if len(shard) >= self.shard_size:
+                yield shard
+                shard = []
+        if shard:
+            yield shard
+
+    def run(self, f):
+        """Yields a list of (is error, JSON line) pairs for every shard
+        of f, in input order. The checkpoint moves past a shard once the
+        next one is asked for, so callers should have saved it by then."""
+        coordinator = RateCoordinator()
+        coordinator.start()
+        buckets = {self.provider: coordinator.TokenBucket(self.rate)}
+
+        def start_pool():
+            return ProcessPoolExecutor(
+                max_workers=self.processes, initializer=init_worker,
+                initargs=(self.options(), buckets, self.memory))
+
+        pool = start_pool()
+        pending = collections.deque()
+        shards = self.shards(f)
+        index = self.checkpoint.index + 1
+        restarts = 0
+        try:
+            while True:
+                while len(pending) < 2 * self.processes:
+                    shard = next(shards, None)
+                    if shard is None:
+                        break
+                    pending.append([shard, pool.submit(translate_shard, (self.fmt, shard))])
+                if not pending:
+                    break
+                shard, future = pending[0]
+                try:
+                    encoded = future.result()
+                except BrokenProcessPool:
+                    restarts += 1
+                    if restarts > self.max_restarts:
+                        raise
+                    pool.shutdown(wait=False)
+                    pool = start_pool()
+                    for entry in pending:
+                        entry[1] = pool.submit(translate_shard, (self.fmt, entry[0]))
+                    continue
+                pending.popleft()
+                lines = []
+                for error, line in encoded:
+                    lines.append((error, f'{{"index": {index}, {line[1:]}'))
+                    index += 1
+                yield lines
+                self.checkpoint.update(index - 1)
+        finally:
+            for _, future in pending:
+                future.cancel()
+            pool.shutdown()
+            coordinator.shutdown()
+            self.checkpoint.save()
+
+
+def main(args, memory=None) -> None:
+    """Runs the batch subcommand with worker processes."""
+    fmt = args.format or guess_format(args.input)
+    sharded = ShardedBatch(
+        args.source, args.target, fmt=fmt, field=args.field,
+        provider=args.provider, processes=args.processes, workers=args.workers,
+        shard_size=args.shard_size, rate=args.rate, checkpoint=args.checkpoint,
+        cache_path=args.cache, use_cache=not args.no_cache, memory=memory,
+        pool_size=args.pool_size, retries=args.retries)
+    fin, fout, ferr = open_streams(args, sharded.checkpoint)
+    try:
+        for lines in sharded.run(fin):
+            for error, line in lines:
+                stream = ferr if error else fout
+                stream.write(line + "\n")
+            fout.flush()
+            ferr.flush()
+            sharded.checkpoint.offsets = file_offsets((fout, ferr))
+    finally:
+        close_streams((fin, fout, ferr))
+    return
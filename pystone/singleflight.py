@@ -0,0 +1,37 @@
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key: the first caller runs
+    the function and every caller that arrives while it is running waits
+    for and shares its result, or its exception."""
+
+    def __init__(self):
+        self.calls = {}
+        self.shared = 0
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, *args, **kwargs):
+        """Calls fn unless a call with key is already in flight, in which
+        case waits for that call instead. Returns fn's result."""
+        with self._lock:
+            future = self.calls.get(key)
+            leader = future is None
+            if leader:
+                future = self.calls[key] = Future()
+            else:
+                self.shared += 1
+        if not leader:
+            return future.result()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                del self.calls[key]
+        return result
@@ -0,0 +1,331 @@
+from concurrent.futures import as_completed
+
+from .audio import AudioCache, mp3_frames
+from .chunking import chunk_text, strip_chunk
+from .constants import REVERSO_AUDIO_CHAR_LIMIT, REVERSO_CHAR_LIMIT
+from .deepl import DeepL
+from .detection import detect, group_by_language, is_auto
+from .executor import Executor
+from .languages import resolve
+from .reverso import Reverso
+from .session import get_session
+from .singleflight import SingleFlight
+
+# Concurrent identical requests made through any Translate share a single
+# upstream call.
+flights = SingleFlight()
+
+
+class Translate:
+    def __init__(self, text=None, source=None, target=None, translation=None,
+                 examples=None, alternatives=None, s=None, cache=None,
+                 audio_cache=None, router=None, memory=None):
+        self.text = text
+        self.source = source or "English"
+        self.target = target
+        self._translation = translation
+        self._examples = examples
+        self._alternatives = alternatives
+        # The most recent parsed response, read lazily by examples and
+        # alternatives.
+        self.result = None
+        self.s = s or get_session()
+        self.cache = cache
+        self.audio_cache = audio_cache or AudioCache()
+        self.router = router
+        self.memory = memory
+        # The language the text was detected in when source is "auto".
+        self.detected = None
+
+    def translate(self) -> None:
+        """Gets translation from the translation memory if it has a close
+        enough match, and otherwise from Reverso, or from the router's
+        providers if there is a router. A source of "auto" is detected
+        from the text."""
+        if not self.text:
+            return
+        if is_auto(self.source):
+            return self._translate_detected("translate")
+        self.detected = None
+        match = None
+        if self.memory is not None:
+            match = self.memory.lookup(self.source, self.target, self.text)
+        if match is not None:
+            parsed_response = {
+                "translation": match.translation,
+                "examples": None,
+                "alternatives": None,
+                "match": {"text": match.text, "score": match.score}
+            }
+        elif len(self.text) > REVERSO_CHAR_LIMIT:
+            parsed_response = self._translate_chunks()
+        elif self.router is not None:
+            parsed_response = self._get("router", lambda: self.router.translate(
+                self.text, self.source, self.target))
+        else:
+            reverso = Reverso(self.text, self.source, self.target, s=self.s)
+            parsed_response = self._get("reverso", reverso.translate)
+        if self.memory is not None and match is None:
+            self.memory.learn(self.source, self.target, self.text,
+                            parsed_response["translation"])
+        self.result = parsed_response
+        self._translation = parsed_response["translation"]
+        self._examples = None
+        self._alternatives = None
+        return
+
+    def _translate_chunks(self) -> dict:
+        """Translates text longer than Reverso's limit by splitting it at
+        sentence boundaries, translating the chunks concurrently and
+        stitching the translations back together in order."""
+        def translate(chunk):
+            before, body, after = strip_chunk(chunk)
+            if not body:
+                return chunk
+            translate = Translate(body, self.source, self.target, s=self.s,
+                                  cache=self.cache, audio_cache=self.audio_cache,
+                                  router=self.router, memory=self.memory)
+            translate.translate()
+            return before + translate.translation + after
+
+        chunks = chunk_text(self.text, REVERSO_CHAR_LIMIT)
+        with Executor() as executor:
+            translations = list(executor.map(
+                lambda chunk: executor.call("reverso", translate, chunk), chunks))
+        return {
+            "input": self.text,
+            "translation": "".join(translations),
+            "examples": None,
+            "alternatives": None
+        }
+
+    def _translate_detected(self, method) -> None:
+        """Detects the language of the text locally and translates it from
+        that language with method, "translate" or "deepl". Text already in
+        the target language is returned as is."""
+        self.detected = detect(self.text)
+        if self.detected == resolve(self.target):
+            parsed_response = {
+                "translation": self.text,
+                "examples": None,
+                "alternatives": None
+            }
+        else:
+            translate = Translate(self.text, self.detected, self.target, s=self.s,
+                                  cache=self.cache, audio_cache=self.audio_cache,
+                                  router=self.router, memory=self.memory)
+            getattr(translate, method)()
+            parsed_response = translate.result
+        self.result = parsed_response
+        self._translation = parsed_response["translation"]
+        self._examples = None
+        self._alternatives = None
+        return
+
+    def audio(self, text, voice=None) -> bytes:
+        """Gets audio from Reverso, read by voice or by the target
+        language's voice."""
+        reverso = Reverso(text, self.source, self.target, s=self.s, voice=voice)
+        if len(text) > REVERSO_AUDIO_CHAR_LIMIT:
+            return b"".join(self._segment_audio(text, reverso.get_reverso_voice()))
+        key = ("audio", reverso.get_reverso_voice(), text)
+        audio = flights.do(key, reverso.audio)
+        return audio
+
+    def audio_file(self, text, sink=None, voice=None) -> str:
+        """Gets the path of an MP3 of text read aloud by voice, or by the
+        target language's voice. Audio that is not cached yet is streamed
+        into the cache, and into sink if given, as it downloads. Without a
+        sink, concurrent downloads of the same audio are shared."""
+        reverso = Reverso(text, self.source, self.target, s=self.s, voice=voice)
+        voice = reverso.get_reverso_voice()
+        path = self.audio_cache.get(voice, text)
+
+        def render():
+            if len(text) > REVERSO_AUDIO_CHAR_LIMIT:
+                return self._segment_audio(text, voice)
+            return reverso.stream_audio()
+
+        if path is None and sink is None:
+            key = ("audio_file", self.audio_cache.directory, voice, text)
+            return flights.do(key, lambda: self.audio_cache.write(
+                voice, text, render()))
+        if path is None:
+            return self.audio_cache.write(voice, text, render(), sink)
+        if sink is not None:
+            with open(path, "rb") as f:
+                sink.write(f.read())
+        return path
+
+    def _segment_audio(self, text, voice):
+        """Reads text longer than Reverso's voices will by splitting it at
+        sentence boundaries and rendering the segments concurrently. Each
+        segment's MP3 frames are yielded, in order, as soon as it and the
+        ones before it are ready, so they form one MP3 without being
+        re-encoded."""
+        segments = [strip_chunk(chunk)[1] for chunk in
+                    chunk_text(text, REVERSO_AUDIO_CHAR_LIMIT)]
+        with Executor() as executor:
+            paths = executor.map(lambda segment: executor.call(
+                "reverso", self.audio_file, segment, voice=voice),
+                [segment for segment in segments if segment])
+            for path in paths:
+                with open(path, "rb") as f:
+                    yield mp3_frames(f.read())
+
+    def deepl(self) -> None:
+        """Gets translation from DeepL."""
+        if not self.text:
+            return
+        if is_auto(self.source):
+            return self._translate_detected("deepl")
+        self.detected = None
+        deepl = DeepL(self.text, self.source, self.target, s=self.s)
+        parsed_response = self._get("deepl", deepl.translate)
+        self.result = parsed_response
+        self._translation = parsed_response["translation"]
+        self._examples = None
+        self._alternatives = None
+        return
+
+    def deepl_many(self, texts) -> list:
+        """Gets translations of several texts from DeepL, packing all the
+        ones that aren't cached into as few requests as possible. Returns
+        one parsed response per text, in order. A source of "auto" groups
+        the texts by their detected language, one request per language,
+        and adds each one's "source" to its response."""
+        if is_auto(self.source):
+            return self._deepl_many_detected(texts)
+        parsed_responses = [None] * len(texts)
+        missing = []
+        for i, text in enumerate(texts):
+            if self.cache is not None:
+                parsed_responses[i] = self.cache.get(
+                    "deepl", resolve(self.source), resolve(self.target), text)
+            if parsed_responses[i] is None:
+                missing.append(i)
+        if missing:
+            deepl = DeepL(None, self.source, self.target, s=self.s)
+            fetched = deepl.deepl_many([texts[i] for i in missing])
+            for i, parsed_response in zip(missing, fetched):
+                parsed_response["alternatives"] = None
+                parsed_responses[i] = parsed_response
+                if self.cache is not None:
+                    self.cache.set("deepl", resolve(self.source),
+                                   resolve(self.target), texts[i], parsed_response)
+        return parsed_responses
+
+    def _deepl_many_detected(self, texts) -> list:
+        parsed_responses = [None] * len(texts)
+        for language, indexes in group_by_language(texts).items():
+            if language is None or language == resolve(self.target):
+                fetched = [{"translation": texts[i], "examples": None,
+                            "alternatives": None} for i in indexes]
+            else:
+                translate = Translate(None, language, self.target, s=self.s,
+                                      cache=self.cache)
+                fetched = translate.deepl_many([texts[i] for i in indexes])
+            for i, parsed_response in zip(indexes, fetched):
+                parsed_responses[i] = {**parsed_response, "source": language}
+        return parsed_responses
+
+    def translate_many(self, targets, callback=None) -> dict:
+        """Translates the text into every language in targets at once.
+        Returns a mapping of each target to its parsed response, or to the
+        exception that prevented it. If given, callback is called with
+        each target and its result as soon as that language completes."""
+        results = {}
+        for target, result in self.iter_translate_many(targets):
+            results[target] = result
+            if callback is not None:
+                callback(target, result)
+        return results
+
+    def iter_translate_many(self, targets):
+        """Yields (target, parsed response or exception) pairs in the order
+        the languages complete. The requests draw from the process-wide
+        Reverso rate limit, but are allowed a burst of one request per
+        target on top of it, so that they are all sent at once."""
+        def translate(target):
+            translate = Translate(self.text, self.source, target, s=self.s,
+                                  cache=self.cache, audio_cache=self.audio_cache,
+                                  router=self.router, memory=self.memory)
+            translate.translate()
+            return translate.to_dict()
+
+        with Executor(max_workers=max(1, len(targets))) as executor:
+            executor.allow_burst("reverso", len(targets))
+            futures = {executor.submit(executor.call, "reverso", translate, t): t
+                       for t in targets}
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], future.result()
+                except Exception as e:
+                    yield futures[future], e
+
+    def _get(self, provider, fetch) -> dict:
+        """Gets a parsed response from the cache, falling back to fetch
+        and caching its result on a miss. Concurrent misses for the same
+        text share a single fetch."""
+        key = (provider, resolve(self.source), resolve(self.target), self.text)
+        if self.cache is not None:
+            parsed_response = self.cache.get(*key)
+            if parsed_response is not None:
+                return parsed_response
+        return flights.do(key, self._fetch, key, fetch)
+
+    def _fetch(self, key, fetch) -> dict:
+        """Calls fetch and caches its parsed response."""
+        parsed_response = fetch()
+        if self.cache is not None:
+            self.cache.set(*key, parsed_response)
+        return parsed_response
+
+    def to_dict(self) -> dict:
+        """The translation, alternatives and examples, with the translation
+        memory match and the detected source language when there are
+        any."""
+        result = {
+            "translation": self.translation,
+            "alternatives": self.alternatives,
+            "examples": self.examples
+        }
+        if self.match is not None:
+            result["match"] = self.match
+        if self.detected is not None:
+            result["source"] = self.detected
+        return result
+
+    @property
+    def match(self) -> dict:
+        """The translation memory segment the translation came from, with
+        its similarity score, or None if it came from a provider."""
+        return self.result.get("match") if self.result else None
+
+    @property
+    def translation(self) -> str:
+        return self._translation
+
+    @translation.setter
+    def translation(self, text) -> None:
+        self._translation = text
+
+    @property
+    def examples(self) -> list:
+        if self._examples is None and self.result is not None:
+            return self.result["examples"]
+        return self._examples
+
+    @examples.setter
+    def examples(self, array) -> None:
+        self._examples = array
+
+    @property
+    def alternatives(self) -> list:
+        if self._alternatives is None and self.result is not None:
+            return self.result["alternatives"]
+        return self._alternatives
+
+    @alternatives.setter
+    def alternatives(self, array) -> None:
+        self._alternatives = array
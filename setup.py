@@ -6,7 +6,6 @@ with open("README.md", "r", encoding="utf-8") as f:
 
 classifiers = [
     "Development Status :: 5 - Production/Stable",
-    "Programming Language :: Python :: 3.6",
     "Programming Language :: Python :: 3.7",
     "Programming Language :: Python :: 3.8",
     "Programming Language :: Python :: 3.9",
@@ -15,6 +14,11 @@ classifiers = [
 ]
 
 requirements = ["requests", "playsound"]
+extras = {
+    "async": ["aiohttp"],
+    "brotli": ["urllib3[brotli]"],
+    "streaming": ["ijson"],
+}
 
 main = os.path.abspath(os.path.dirname(__file__))
 about = {}
@@ -35,9 +39,11 @@ setuptools.setup(
     classifiers=classifiers,
     keywords=["pystone", "translation",
               "language", "python", "reverso", "deepl"],
+    python_requires=">=3.7",
     install_requires=requirements,
+    extras_require=extras,
     entry_points={
-        "console_scripts": ["pystone=pystone.__init__:main"]
+        "console_scripts": ["pystone=pystone.cli:main"]
     },
     project_urls={
         "Source": "https://github.com/GBS3/pystone"